@@ -0,0 +1,181 @@
+import numpy as np  #Math library
+import math     #python's math module
+from DragModel import dragConstant, acceleration, ForceModel
+from JitKernels import useNumba, eulerBatchKernel, BATCH_COLUMNS
+
+
+def integrateBatch(theta, v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.005, maxSteps=100000, backend='python', stopX=None, floor=0.0, wind=0.0, model=None):
+    """
+    Integrates many trajectories at once using the same Euler method as EulerKinematics, advancing
+    every trajectory in lockstep as numpy arrays instead of one pure-Python loop per shot.
+
+    Every argument may be a scalar or an array; they are broadcast against each other, so a sweep
+    over launch angles is simply integrateBatch(np.linspace(...)). Each lane stops updating as soon
+    as its y-displacement becomes negative (same stopping rule as the scripts) or after maxSteps steps.
+
+    floor (the ground height relative to the launch point) and stopX may be arrays too. With stopX a
+    lane also stops once its x reaches stopX, which Targeting uses to get the height at a distance.
+
+    The acceleration comes from DragModel.acceleration, the same function the other solvers use. wind
+    (also scalar or array) is a horizontal wind speed in the +x direction; drag then acts on the
+    velocity relative to the air, vX - wind.
+
+    model (a DragModel.ForceModel) adds a wind profile, an exponential atmosphere, a launch height and
+    uneven terrain. Its wind is added to wind, and a lane lands where it drops below the terrain
+    (shifted by floor). y, apex and height stay relative to the launch point. The model is plain
+    numbers and arrays, so both backends use it without any per-lane Python calls.
+
+    Returns a dict of arrays (one entry per lane) with the final sample of every lane:
+        t, x, y, vX, vY, aX, aY:  the first sample below ground (or the last sample if it never landed)
+        range, flightTime:        where and when the lane crossed y = floor (or x = stopX),
+                                  linearly interpolated between the last two samples
+        height:                   y at that point (floor for lanes that landed)
+        impactVX, impactVY:       velocity at that point, interpolated the same way
+        apex, apexTime:           greatest height reached and the time it was reached
+        steps:                    number of time steps taken
+        landed:                   False if the lane was cut off by maxSteps or stopped at stopX
+
+    With backend='numba' (or 'auto') the lanes run through the compiled JitKernels.eulerBatchKernel
+    when numba is installed. It releases the GIL, so several threads can integrate batches at once.
+
+    Units: kg, m, sec, rad
+    """
+    stopping = stopX is not None
+    theta, v0, m, rho, A, Cd, g, tStep, stopX, floor, wind = np.broadcast_arrays(*[np.asarray(arg, dtype=float) for arg in (theta, v0, m, rho, A, Cd, g, tStep, stopX if stopping else math.inf, floor, wind)])
+    shape = theta.shape
+    n = theta.size
+    if model is not None:
+        wind = wind + model.wind
+        floor = floor - model.launchHeight     #Ground heights relative to the launch point
+    terrain = model is not None and model.hasTerrain
+
+    #Per-lane constants (only kept for lanes that are still in the air)
+    c = dragConstant(rho, Cd, A, m).ravel()     #Drag force divided by mass and v^2
+    g = g.ravel().copy()
+    h = tStep.ravel().copy()
+    stopX = stopX.ravel().copy()
+    floor = floor.ravel().copy()
+    wind = wind.ravel().copy()
+    lane = np.arange(n)     #Original index of every lane that is still in the air
+
+    if useNumba(backend):
+        table = np.empty((n, len(BATCH_COLUMNS)))
+        physics = ForceModel() if model is None else model
+        eulerBatchKernel(theta.ravel().copy(), v0.ravel().copy(), c, g, h, wind, stopX, floor, maxSteps,
+                         physics.windExponent, physics.windHeight, physics.scaleHeight, physics.launchHeight, physics.terrainX, physics.terrainHeight, table)
+        out = {key: table[:, i].reshape(shape) for i, key in enumerate(BATCH_COLUMNS)}
+        out['steps'] = out['steps'].astype(np.int64)
+        out['landed'] = out['landed'] > 0
+        return out
+
+    #Initial values
+    vX = (v0 * np.cos(theta)).ravel()
+    vY = (v0 * np.sin(theta)).ravel()
+    x = np.zeros(n)
+    y = np.zeros(n)
+    aX, aY = forces(vX, vY, y, c, g, wind, model)
+    if terrain:
+        ground = floor + model.terrain(x)
+
+    #Output arrays, filled in as each lane lands
+    out = {}
+    for key in ('t', 'x', 'y', 'vX', 'vY', 'aX', 'aY', 'range', 'flightTime', 'height', 'impactVX', 'impactVY', 'apex', 'apexTime'):
+        out[key] = np.zeros(n)
+    out['steps'] = np.zeros(n, dtype=np.int64)
+    out['landed'] = np.zeros(n, dtype=bool)
+    apex = np.zeros(n)
+    apexTime = np.zeros(n)
+
+    counter = 1
+    #Loop until every lane's y-displacement becomes negative (projectile reaches ground again)
+    while lane.size > 0:
+        t = counter * h
+        vXPrev, vYPrev = vX, vY
+        vX = vX + aX*h      #v = v0 + at
+        vY = vY + aY*h
+        aX, aY = forces(vX, vY, y, c, g, wind, model)
+        hSquared = h*h
+        xPrev, yPrev = x, y
+        x = x + vX*h + 0.5*aX*hSquared     #x = x0 + v0t + 1/2 * at^2
+        y = y + vY*h + 0.5*aY*hSquared     #y = y0 + v0t + 1/2 * at^2
+
+        higher = y > apex
+        apex = np.where(higher, y, apex)
+        apexTime = np.where(higher, t, apexTime)
+
+        if terrain:
+            groundPrev, ground = ground, floor + model.terrain(x)
+            landed = y < ground
+        else:
+            landed = y < floor
+        reached = x >= stopX if stopping else landed
+        done = landed | reached
+        timedOut = counter > maxSteps - 1
+        if timedOut or done.any():
+            if timedOut:
+                done = np.ones(lane.size, dtype=bool)
+            idx = lane[done]
+            for key, value in (('t', t), ('x', x), ('y', y), ('vX', vX), ('vY', vY), ('aX', aX), ('aY', aY), ('apex', apex), ('apexTime', apexTime)):
+                out[key][idx] = value[done]
+            #Interpolate the ground (or stopX) crossing between the last two samples
+            x0, y0, x1, y1 = xPrev[done], yPrev[done], x[done], y[done]
+            onGround = landed[done]
+            if terrain:     #Where y - ground changes sign, for ground that differs between the two samples
+                before, after = y0 - groundPrev[done], y1 - ground[done]
+                fraction = np.where(landed[done], before / (before - after), 1.0)
+            else:
+                fraction = np.where(landed[done], (y0 - floor[done]) / (y0 - y1), 1.0)
+            if stopping:    #Whichever of the two crossings comes first
+                across = reached[done] & (~onGround | ((stopX[done] - x0) / (x1 - x0) < fraction))
+                fraction = np.where(across, (stopX[done] - x0) / (x1 - x0), fraction)
+                onGround = onGround & ~across
+            out['range'][idx] = x0 + fraction * (x1 - x0)
+            height = y0 + fraction * (y1 - y0)
+            out['height'][idx] = height if terrain else np.where(onGround, floor[done], height)
+            out['flightTime'][idx] = t[done] - (1 - fraction) * h[done]
+            out['impactVX'][idx] = vXPrev[done] + fraction * (vX[done] - vXPrev[done])
+            out['impactVY'][idx] = vYPrev[done] + fraction * (vY[done] - vYPrev[done])
+            out['steps'][idx] = counter
+            out['landed'][idx] = onGround
+
+            #Drop the finished lanes so they stop costing anything
+            keep = ~done
+            lane = lane[keep]
+            c, g, h, stopX, floor, wind = c[keep], g[keep], h[keep], stopX[keep], floor[keep], wind[keep]
+            vX, vY, aX, aY = vX[keep], vY[keep], aX[keep], aY[keep]
+            x, y, apex, apexTime = x[keep], y[keep], apex[keep], apexTime[keep]
+            if terrain:
+                ground = ground[keep]
+
+        counter += 1
+
+    for key in out:
+        out[key] = out[key].reshape(shape)
+    return out
+
+
+def forces(vX, vY, y, c, g, wind, model):
+    """
+    Returns the (x, y) acceleration of lanes at heights y above the launch point. Drag acts on the
+    velocity relative to the air; model (or None for still, uniform air) sets the wind and density there.
+    """
+    if model is None:
+        return acceleration(vX - wind, vY, c, g)
+    z = y + model.launchHeight
+    return acceleration(vX - model.windAt(wind, z), vY, model.dragAt(c, z), g)
+
+
+def main():
+    """
+    Integrates a fan of launch angles in one batch and prints the range of a few of them.
+
+    Units: kg, m, sec, rad
+    """
+    thetas = np.radians(np.arange(5, 90, 5))
+    result = integrateBatch(thetas, v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.005)
+    for i in range(len(thetas)):
+        print("theta: " + str(round(math.degrees(thetas[i]))) + "  range: " + str(result['x'][i]) + "  apex: " + str(result['apex'][i]))
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
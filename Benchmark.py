@@ -0,0 +1,211 @@
+import numpy as np  #Math library
+import math     #python's math module
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from BatchKinematics import integrateBatch
+from CustomKinematics import integrateCustom
+from EulerKinematics import integrateEuler
+from DragModel import ForceModel
+from JitKernels import HAVE_NUMBA, TOLERANCE, deviation
+from RungeKuttaKinematics import integrateRK4, integrateAdaptive
+
+#Benchmark matrix
+TSTEPS = (0.05, 0.01, 0.005, 0.001)     #Step sizes of the fixed-step solvers
+RTOLS = (1e-4, 1e-6, 1e-8, 1e-10)       #Tolerances of the adaptive solver
+DRAG = {'light': (0.01, 0.25), 'default': (0.05, 0.5), 'heavy': (0.2, 1.0)}    #Name: (A, Cd)
+BATCH_SIZES = (1, 100, 10000)
+SHOT = {'v0': 30, 'theta': math.radians(45), 'm': 1, 'rho': 1.225, 'g': 9.8}     #Everything but the drag
+RECORD = ('solver', 'backend', 'setting', 'drag', 'A', 'Cd', 'batch', 'wallTime', 'timePerShot', 'steps',
+          'evaluations', 'peakMemory', 'rangeError', 'apexError')     #Fields of every result
+
+
+def measure(run, repeat=3):
+    """
+    Calls run() repeat times and returns (result, best wall time in seconds, peak traced memory in
+    bytes). Memory is measured on one extra call under tracemalloc so that tracing does not slow
+    down the timed calls.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def reference(A, Cd):
+    """
+    Returns the adaptive RK45 trajectory at rtol=1e-13 that every error is measured against.
+    """
+    return integrateAdaptive(SHOT['v0'], SHOT['theta'], SHOT['m'], SHOT['rho'], A, Cd, SHOT['g'], rtol=1e-13, atol=1e-13)
+
+
+def singleRuns(backends, tSteps=TSTEPS):
+    """
+    Yields (solver, backend, setting, function) for every single-shot solver run of the matrix;
+    function takes (A, Cd) and returns a Trajectory.
+    """
+    v0, theta, m, rho, g = SHOT['v0'], SHOT['theta'], SHOT['m'], SHOT['rho'], SHOT['g']
+    for tStep in tSteps:
+        for backend in backends:
+            yield 'euler', backend, 'tStep=%g' % tStep, lambda A, Cd, tStep=tStep, backend=backend: integrateEuler(v0, theta, m, rho, A, Cd, g, tStep, backend=backend)
+            yield 'custom', backend, 'tStep=%g' % tStep, lambda A, Cd, tStep=tStep, backend=backend: integrateCustom(v0, theta, m, rho, A, Cd, g, tStep, backend=backend)
+        yield 'rk4', 'python', 'tStep=%g' % tStep, lambda A, Cd, tStep=tStep: integrateRK4(v0, theta, m, rho, A, Cd, g, tStep)
+    for rtol in RTOLS:
+        yield 'rk45', 'python', 'rtol=%g' % rtol, lambda A, Cd, rtol=rtol: integrateAdaptive(v0, theta, m, rho, A, Cd, g, rtol=rtol, atol=rtol*1e-2)
+
+
+def checkKernels(tSteps=TSTEPS, drag=DRAG, thetas=np.radians(np.linspace(5, 85, 9))):
+    """
+    Checks that every compiled kernel agrees with its reference implementation to within
+    JitKernels.TOLERANCE: the Euler and custom single-shot loops on every launch angle, step size and
+    drag regime, and the batch integrator with and without a ForceModel (wind profile, atmosphere,
+    launch height and terrain). Returns the largest deviation of each kernel, and raises
+    AssertionError naming the first run that exceeds the tolerance. Does nothing without numba.
+    """
+    if not HAVE_NUMBA:
+        return {}
+    v0, m, rho, g = SHOT['v0'], SHOT['m'], SHOT['rho'], SHOT['g']
+    models = {'none': None, 'physics': ForceModel.sampleTerrain(lambda x: 3 * np.sin(x / 15), 150, wind=2.0, windExponent=0.14, scaleHeight=8500.0, launchHeight=5.0)}
+    worst = {}
+
+    def check(kernel, setting, reference, compiled):
+        error = deviation(reference, compiled)
+        worst[kernel] = max(worst.get(kernel, 0.0), error)
+        if not error <= TOLERANCE:
+            raise AssertionError(kernel + " kernel deviates from the reference by " + str(error) + " > " + str(TOLERANCE) + " at " + setting)
+
+    for name, (A, Cd) in drag.items():
+        for tStep in tSteps:
+            setting = name + " drag, tStep=%g" % tStep
+            for theta in thetas:
+                check('euler', setting + ", theta=%g" % theta, integrateEuler(v0, theta, m, rho, A, Cd, g, tStep).data, integrateEuler(v0, theta, m, rho, A, Cd, g, tStep, backend='numba').data)
+                check('custom', setting + ", theta=%g" % theta, integrateCustom(v0, theta, m, rho, A, Cd, g, tStep).data, integrateCustom(v0, theta, m, rho, A, Cd, g, tStep, backend='numba').data)
+            for modelName, model in models.items():
+                reference = integrateBatch(thetas, v0, m, rho, A, Cd, g, tStep, model=model)
+                compiled = integrateBatch(thetas, v0, m, rho, A, Cd, g, tStep, backend='numba', model=model)
+                columns = [key for key in reference if key != 'landed']
+                check('batch/' + modelName, setting, np.column_stack([reference[key] for key in columns]), np.column_stack([compiled[key] for key in columns]))
+                if not np.array_equal(reference['landed'], compiled['landed']):
+                    raise AssertionError("batch/" + modelName + " kernel lands different lanes than the reference at " + setting)
+    return worst
+
+
+def runBenchmarks(repeat=3, tSteps=TSTEPS, drag=DRAG, batchSizes=BATCH_SIZES):
+    """
+    Runs every solver and backend over the matrix of step sizes (tolerances for RK45), drag regimes
+    and batch sizes, and returns a list of result dicts with the fields in RECORD.
+
+    Errors are absolute range and apex errors in metres against an RK45 reference at rtol=1e-13. All
+    lanes of a batch run the same shot, so the batch error is the error of that shot and the batch
+    size only changes the cost. The numba backends are called once before timing so that
+    compilation is not counted.
+    """
+    backends = ('python', 'numba') if HAVE_NUMBA else ('python',)
+    results = []
+    for name, (A, Cd) in drag.items():
+        exact = reference(A, Cd)
+
+        def record(solver, backend, setting, batch, seconds, steps, evaluations, peak, rangeError, apexError):
+            results.append(dict(zip(RECORD, (solver, backend, setting, name, A, Cd, batch, seconds, seconds / batch,
+                                             int(steps), int(evaluations), peak, float(rangeError), float(apexError)))))
+
+        for solver, backend, setting, function in singleRuns(backends, tSteps):
+            if backend != 'python':
+                function(A, Cd)
+            trajectory, seconds, peak = measure(lambda: function(A, Cd), repeat)
+            record(solver, backend, setting, 1, seconds, trajectory.steps, trajectory.evaluations, peak,
+                   abs(trajectory.range - exact.range), abs(trajectory.apex - exact.apex))
+
+        for tStep in tSteps:
+            for batch in batchSizes:
+                theta = np.full(batch, SHOT['theta'])
+                for backend in backends:
+                    run = lambda: integrateBatch(theta, SHOT['v0'], SHOT['m'], SHOT['rho'], A, Cd, SHOT['g'], tStep, backend=backend)
+                    if backend != 'python':
+                        run()
+                    result, seconds, peak = measure(run, repeat)
+                    steps = int(result['steps'].sum())
+                    record('batch', backend, 'tStep=%g' % tStep, batch, seconds, steps, steps, peak,
+                           np.max(np.abs(result['range'] - exact.range)), np.max(np.abs(result['apex'] - exact.apex)))
+    return results
+
+
+def environment():
+    """
+    Returns the versions and machine details stored alongside the results.
+    """
+    info = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    if HAVE_NUMBA:
+        import numba
+        info['numba'] = numba.__version__
+    return info
+
+
+def save(results, path):
+    """
+    Writes the results and environment() to path as JSON.
+    """
+    with open(path, 'w') as file:
+        json.dump({'environment': environment(), 'results': results}, file, indent=1)
+
+
+def compare(basePath, newPath, threshold=1.2):
+    """
+    Compares two saved benchmark files and returns the runs whose wall time grew by more than
+    threshold times, or whose range error grew by more than threshold times (plus 1e-12 m), as
+    (key, old record, new record) tuples. The key is (solver, backend, setting, drag, batch).
+    """
+    def load(path):
+        with open(path) as file:
+            return {(r['solver'], r['backend'], r['setting'], r['drag'], r['batch']): r for r in json.load(file)['results']}
+
+    base = load(basePath)
+    new = load(newPath)
+    regressions = []
+    for key in sorted(base.keys() & new.keys()):
+        old, current = base[key], new[key]
+        if current['wallTime'] > threshold * old['wallTime'] or current['rangeError'] > threshold * old['rangeError'] + 1e-12:
+            regressions.append((key, old, current))
+    return regressions
+
+
+def printResults(results):
+    print("solver  backend  setting      drag     batch   time/shot (s)      steps  peak mem (B)  range error  apex error")
+    for r in results:
+        print("%-7s %-8s %-12s %-8s %5d  %14.3e  %9d  %12d  %11.2e  %10.2e" % (r['solver'], r['backend'], r['setting'], r['drag'], r['batch'],
+              r['timePerShot'], r['steps'], r['peakMemory'], r['rangeError'], r['apexError']))
+
+
+def main(path='benchmark.json', basePath=None):
+    """
+    Checks that the compiled kernels agree with the reference implementations (see checkKernels),
+    runs the whole benchmark matrix, prints it, and saves it to path as JSON. If basePath names an
+    earlier result file, the runs that got slower or less accurate since then are printed too.
+
+    Usage: python Benchmark.py [output.json [baseline.json]]
+    """
+    for kernel, error in checkKernels().items():
+        print(kernel + " kernel: largest relative deviation from the reference " + str(error) + " (tolerance " + str(TOLERANCE) + ")")
+    results = runBenchmarks()
+    printResults(results)
+    save(results, path)
+    print("saved " + str(len(results)) + " results to " + path)
+
+    if basePath is not None:
+        for key, old, new in compare(basePath, path):
+            print("regression " + str(key) + ": time " + str(old['wallTime']) + " -> " + str(new['wallTime'])
+                  + ", range error " + str(old['rangeError']) + " -> " + str(new['rangeError']))
+
+
+if __name__ == "__main__":  #Run the main function
+    main(*sys.argv[1:3])
@@ -0,0 +1,213 @@
+import numpy as np  #Math library
+import math     #python's math module
+import json
+import os
+import shutil
+
+MANIFEST = 'manifest.json'
+TRAJECTORY = 'trajectory'   #Name of the ragged per-row trajectory column of every chunk
+
+
+class ColumnStore:
+    """
+    On-disk table of per-shot results, written chunk by chunk and read back without loading it whole.
+
+    A store is a directory with one subdirectory per appended chunk, holding one .npy file per column,
+    plus manifest.json with the column types, the row count and the minimum and maximum of every column
+    of every chunk. Reading memory-maps only the columns asked for, and a filter skips every chunk whose
+    range cannot match before touching its files, so a query over a store of many GB reads little more
+    than the rows it returns.
+
+    mode:       'r' to read, 'a' to append (creating the store if needed), 'w' to start a new store
+                (an existing store at path is replaced)
+    float32:    store float columns as float32, halving their size (about 7 significant digits)
+    compress:   store every column as a compressed .npz instead of .npy. Smaller, but compressed
+                columns are loaded into memory instead of memory-mapped
+
+    float32 and compress are fixed when the store is created. Every chunk may also hold decimated
+    trajectories, one (k, 7) array of t, x, y, vX, vY, aX, aY per row, read back with trajectory(row).
+
+    Units: kg, m, sec, rad
+    """
+
+    def __init__(self, path, mode='r', float32=False, compress=False):
+        if mode not in ('r', 'a', 'w'):
+            raise ValueError("unknown mode: " + str(mode) + " (expected r, a or w)")
+        self.path = path
+        self.mode = mode
+        manifestPath = os.path.join(path, MANIFEST)
+        if mode == 'w' and os.path.exists(path):
+            if not os.path.exists(manifestPath) and os.listdir(path):
+                raise ValueError(str(path) + " is not empty and not a ColumnStore")
+            shutil.rmtree(path)
+        if os.path.exists(manifestPath):
+            with open(manifestPath) as file:
+                self.manifest = json.load(file)
+        elif mode == 'r':
+            raise FileNotFoundError("no ColumnStore at " + str(path))
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.manifest = {'float32': float32, 'compress': compress, 'rows': 0, 'columns': {}, 'chunks': []}
+            self.writeManifest()
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def columns(self):
+        return tuple(self.manifest['columns'])
+
+    @property
+    def chunkCount(self):
+        return len(self.manifest['chunks'])
+
+    def writeManifest(self):
+        #Written to a temporary file and renamed, so a reader never sees half a manifest and a crash
+        #during an append leaves the store as it was before it
+        temporary = os.path.join(self.path, MANIFEST + '.tmp')
+        with open(temporary, 'w') as file:
+            json.dump(self.manifest, file)
+        os.replace(temporary, os.path.join(self.path, MANIFEST))
+
+    def append(self, chunk, trajectories=None):
+        """
+        Appends chunk, a dict from column names to equal-length 1D arrays, as a new chunk of rows.
+        The first append fixes the columns; later chunks must have the same ones. trajectories, if
+        given, is a list with one (k, 7) array per row (k may differ between rows).
+        """
+        if self.mode == 'r':
+            raise ValueError("ColumnStore opened read-only")
+        arrays = {name: np.asarray(values) for name, values in chunk.items()}
+        rows = {len(values) for values in arrays.values()}
+        if len(rows) != 1 or any(values.ndim != 1 for values in arrays.values()):
+            raise ValueError("every column of a chunk must be a 1D array of the same length")
+        rows = rows.pop()
+        if self.manifest['chunks'] and set(arrays) != set(self.manifest['columns']):
+            raise ValueError("chunk columns " + str(sorted(arrays)) + " differ from the store's " + str(sorted(self.manifest['columns'])))
+        if trajectories is not None and len(trajectories) != rows:
+            raise ValueError("expected one trajectory per row")
+
+        name = 'chunk%06d' % len(self.manifest['chunks'])
+        directory = os.path.join(self.path, name)
+        os.makedirs(directory, exist_ok=True)
+        stats = {}
+        for column, values in arrays.items():
+            if self.manifest['float32'] and values.dtype == np.float64:
+                values = values.astype(np.float32)
+            self.writeColumn(directory, column, values)
+            self.manifest['columns'].setdefault(column, values.dtype.str)
+            finite = values[np.isfinite(values)] if values.dtype.kind == 'f' else values
+            stats[column] = [float(finite.min()), float(finite.max())] if finite.size else None
+        if trajectories is not None:
+            lengths = [len(trajectory) for trajectory in trajectories]
+            data = np.concatenate([np.asarray(trajectory, dtype=float).reshape(-1, 7) for trajectory in trajectories]) if rows else np.empty((0, 7))
+            self.writeColumn(directory, TRAJECTORY, data.astype(np.float32) if self.manifest['float32'] else data)
+            self.writeColumn(directory, TRAJECTORY + '.offsets', np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64))
+
+        self.manifest['chunks'].append({'name': name, 'start': self.manifest['rows'], 'rows': rows, 'stats': stats, 'trajectories': trajectories is not None})
+        self.manifest['rows'] += rows
+        self.writeManifest()
+
+    def writeColumn(self, directory, column, values):
+        if self.manifest['compress']:
+            np.savez_compressed(os.path.join(directory, column + '.npz'), values=values)
+        else:
+            np.save(os.path.join(directory, column + '.npy'), values)
+
+    def readColumn(self, chunk, column):
+        path = os.path.join(self.path, chunk['name'], column)
+        if self.manifest['compress']:
+            with np.load(path + '.npz') as file:
+                return file['values']
+        return np.load(path + '.npy', mmap_mode='r')
+
+    def matches(self, chunk, where):
+        """
+        Returns False if no row of chunk can satisfy where, judging by its column ranges alone.
+        """
+        for column, (low, high) in where.items():
+            stats = chunk['stats'][column]
+            if stats is None or stats[1] < low or stats[0] > high:
+                return False
+        return True
+
+    def scan(self, columns=None, where=None):
+        """
+        Yields the rows of the store chunk by chunk, as dicts from column names to arrays plus 'row',
+        the index of every row in the whole store (for trajectory).
+
+        columns:    names of the columns to read (default all of them)
+        where:      dict from column names to (low, high); only rows with low <= value <= high in every
+                    one of those columns are returned. Chunks whose range misses are skipped unread
+
+        Without where the arrays are read-only memory maps (unless the store is compressed), so
+        nothing is read from disk until it is used.
+        """
+        columns = self.columns if columns is None else tuple(columns)
+        where = where or {}
+        for name in set(columns) | set(where):
+            if name not in self.manifest['columns']:
+                raise KeyError("no column " + str(name) + " in the store")
+        for chunk in self.manifest['chunks']:
+            if not self.matches(chunk, where):
+                continue
+            keep = None
+            for column, (low, high) in where.items():
+                values = self.readColumn(chunk, column)
+                inside = (values >= low) & (values <= high)
+                keep = inside if keep is None else keep & inside
+            out = {column: self.readColumn(chunk, column) for column in columns}
+            out['row'] = np.arange(chunk['start'], chunk['start'] + chunk['rows'])
+            if keep is not None:
+                if not keep.any():
+                    continue
+                out = {column: values[keep] for column, values in out.items()}
+            yield out
+
+    def read(self, columns=None, where=None):
+        """
+        Returns the rows selected by scan(columns, where) as one dict of in-memory arrays.
+        """
+        chunks = list(self.scan(columns, where))
+        columns = (self.columns if columns is None else tuple(columns)) + ('row',)
+        if not chunks:
+            return {column: np.empty(0, dtype=np.int64 if column == 'row' else np.dtype(self.manifest['columns'][column])) for column in columns}
+        return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in columns}
+
+    def trajectory(self, row):
+        """
+        Returns the stored (k, 7) trajectory of row (an index into the whole store), or None if its
+        chunk was appended without trajectories.
+        """
+        if not 0 <= row < len(self):
+            raise IndexError("row " + str(row) + " out of range for a store of " + str(len(self)) + " rows")
+        starts = [chunk['start'] for chunk in self.manifest['chunks']]
+        chunk = self.manifest['chunks'][int(np.searchsorted(starts, row, side='right')) - 1]
+        if not chunk['trajectories']:
+            return None
+        offsets = self.readColumn(chunk, TRAJECTORY + '.offsets')
+        i = row - chunk['start']
+        return np.asarray(self.readColumn(chunk, TRAJECTORY)[offsets[i]:offsets[i + 1]])
+
+
+def main():
+    """
+    Sweeps launch angle and speed into a store, with decimated trajectories, and queries it back.
+
+    Units: kg, m, sec, rad
+    """
+    from ParameterSweep import sweep
+    axes = {'theta': np.radians(np.linspace(5, 85, 81)), 'v0': np.linspace(10, 50, 41)}
+    store = ColumnStore('sweep.store', 'w', float32=True)
+    for _ in sweep(axes, chunkSize=500, store=store, trajectoryPoints=100):
+        pass
+    print("rows: " + str(len(store)) + " in " + str(store.chunkCount) + " chunks")
+
+    fast = store.read(['theta', 'v0', 'range'], where={'v0': (45, 50)})
+    best = int(np.argmax(fast['range']))
+    print("greatest range with v0 >= 45: " + str(fast['range'][best]) + " at theta=" + str(math.degrees(fast['theta'][best])) + " v0=" + str(fast['v0'][best]))
+    print("its trajectory: " + str(len(store.trajectory(int(fast['row'][best])))) + " samples")
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
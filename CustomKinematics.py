@@ -1,5 +1,3 @@
-# matplotlib 3.3.1
-import matplotlib.pyplot as plt #Plotting Library
 import numpy as np  #Math library
 import scipy.integrate as integrate     #Integration library
 import scipy.special as special         #Integration library
@@ -7,8 +5,18 @@ from sympy import Symbol, sin, cos, tan, sec, csc, cot  #Trig Library
 from sympy.integrals.trigonometry import trigintegrate  #Integration library
 from sympy.abc import x     #Integration library
 import math     #python's math module
-
-def main():
+from DragModel import dragConstant, acceleration
+from RungeKuttaKinematics import integrateAdaptive
+from Trajectory import Trajectory, allocate, grow
+from JitKernels import useNumba, customKernel
+from Profiling import finish, profiled
+from Plotting import plotTrajectory
+
+SMALL_ANGLE = 1e-9  #Below this sin(theta), the y drag is treated as linear (see streamCustom)
+LOG2 = math.log(2)
+PANELS = (('t', ('x', 'y')), ('x', ('y',)), ('t', ('theta',)), ('t', ('vX',)), ('t', ('vY',)))     #Plots of plotData (see Plotting.plotTrajectory)
+
+def main(adaptive=False, tracer=None, plotPath=None):
     """
     This script takes any initial values and constants and calculates and plots the trajectory
     of an object assuming constant gravitational force and typical drag force equation.
@@ -19,196 +27,197 @@ def main():
 
     Note: I made some use of online integral calculators.
 
+    With adaptive=True the fixed tStep loop is replaced by adaptive RK45 steps on the full drag
+    equation that find the apex and the ground impact exactly (see RungeKuttaKinematics.integrateAdaptive).
+
+    Steps are not printed; pass a Tracing.StepTracer (e.g. StepTracer(PrintSink())) to see them.
+    With plotPath the plots are written to that file instead of shown (see Plotting.plotTrajectory).
+
     Units: kg, m, sec, rad
     """
     #Drag Force Equation: 1/2 * rho * Cd * A * v^2
 
     #User-Defined Constants
-    global m
-    global v0
-    global theta
-    global rho  #Fluid Density
-    global A    #Cross-sectional Area
-    global Cd   #Drag coefficient
-    global tStep
-    global g
-
     m = 1
     v0 = 30
     theta = math.radians(45)
-    rho = 1.225
-    A = 0.05
-    Cd = 0.5    #A ball is approx. 0.5
+    rho = 1.225     #Fluid Density
+    A = 0.05        #Cross-sectional Area
+    Cd = 0.5        #Drag coefficient, a ball is approx. 0.5
     tStep = 0.005
     g = 9.8
 
+    if adaptive:
+        #Adaptive-step mode: the apex and ground impact are root-found instead of overshot
+        trajectory = integrateAdaptive(v0, theta, m, rho, A, Cd, g, tracer=tracer)
+        print("max height reached at time=" + str(trajectory.apexTime))
+        print("steps: " + str(trajectory.steps) + " (" + str(trajectory.rejected) + " rejected)")
+    else:
+        trajectory = integrateCustom(v0, theta, m, rho, A, Cd, g, tStep, tracer=tracer)
+        print("max height reached at time=" + str(trajectory.apexTime))
+
+    plotData(trajectory, plotPath)
+
+
+@profiled
+def integrateCustom(v0, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.005, maxSteps=100000, tracer=None, backend='python', profiler=None):
+    """
+    Integrates a trajectory with the separation of variables method until the y-displacement becomes
+    negative, and returns it as a Trajectory. If a tracer (Tracing.StepTracer) is given, every sample
+    is recorded to it.
+
+    Every step solves the velocity exactly for the angle at the start of the step, and the position
+    moves by the exact integral of that velocity over the step, split at the apex when the step
+    crosses it. Nearly horizontal motion (sin(theta) < SMALL_ANGLE, where k would divide by zero)
+    uses the linear drag limit instead.
+
+    With backend='numba' (or 'auto') the loop runs as the compiled JitKernels.customKernel when numba
+    is installed, and otherwise collects the samples of the pure-Python streamCustom loop.
+
+    This method does not compute accelerations itself, so the aX and aY columns hold the drag and
+    gravity acceleration (DragModel.acceleration) at every sample.
 
-    #Data Structures
-    global tHist
-    global xHist
-    global yHist
-    global thetaHist
-    global vHist
-    global vXHist
-    global vYHist
-    tHist = []      #list for all time steps
-    xHist = []      #list for all x position steps
-    yHist = []      #list for all y position steps
-    thetaHist = []  #List for all theta at every time step
-    vHist = []      #list for all velocities at every time step
-    vXHist = []     #list for all x-axis velocities at every time step
-    vYHist = []     #list for all y-axis velocities at every time step
+    A Profiling.Profiler passed as profiler times the setup, integration, events and output phases.
+
+    Units: kg, m, sec, rad
+    """
+    if profiler is not None:
+        profiler.begin('custom', 'numba' if useNumba(backend) else 'python')
+    data = allocate(v0, theta, g, tStep, maxSteps)     #Rows of t, x, y, vX, vY, aX, aY
+    if profiler is not None:
+        profiler.mark('setup')
+
+    if useNumba(backend):
+        counter = customKernel(v0, theta, m, rho, A, Cd, g, tStep, maxSteps, data)
+        while counter < 0:
+            data = np.empty((2 * data.shape[0], data.shape[1]))
+            counter = customKernel(v0, theta, m, rho, A, Cd, g, tStep, maxSteps, data)
+        if profiler is not None:
+            profiler.mark('integration')
+        if tracer is not None:
+            for row in data[:counter+1]:
+                tracer.record(row)
+            tracer.flush()
+        if profiler is not None:
+            profiler.mark('output')
+        return finish(Trajectory(data[:counter+1], counter, counter), profiler, 'events')
+
+    for counter, row in enumerate(streamCustom(v0, theta, m, rho, A, Cd, g, tStep, maxSteps)):
+        if counter == data.shape[0]:
+            data = grow(data)
+        data[counter] = row
+        if tracer is not None:
+            tracer.record(data[counter])
+
+    if profiler is not None:
+        profiler.mark('integration')
+    if tracer is not None:
+        tracer.flush()
+    if profiler is not None:
+        profiler.mark('output')
+    return finish(Trajectory(data[:counter+1], counter, counter), profiler, 'events')
+
+
+def streamCustom(v0, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.005, maxSteps=100000):
+    """
+    Generator version of integrateCustom: yields every sample as a (t, x, y, vX, vY, aX, aY) tuple as
+    soon as it is computed, ending with the first sample below ground, and keeps nothing else. See
+    Streaming for decimation, fixed-size blocks and summary-only runs in constant memory.
+
+    Units: kg, m, sec, rad
+    """
+    c = dragConstant(rho, Cd, A, m)     #Drag force divided by mass and v^2
 
     #Initialize intial values
-    tHist.append(0.0)
-    xHist.append(0.0)
-    yHist.append(0.0)
-    thetaHist.append(theta)
-    vHist.append(v0)
-    vXHist.append(v0 * math.cos(theta))
-    vYHist.append(v0 * math.sin(theta))
-    vTheta = math.atan(vYHist[0] / vXHist[0])
-    # print("t: " + str(tHist[0]))
-    # print("x: " + str(xHist[0]))
-    # print("y: " + str(yHist[0]))
-    # print("v: " + str(vHist[0]))
-    # print("Vx: " + str(vXHist[0]))
-    # print("Vy: " + str(vYHist[0]))
-
-    #Convenience variables
-    global k
+    t = 0.0
+    x = 0.0
+    y = 0.0
+    vX = v0 * math.cos(theta)
+    vY = v0 * math.sin(theta)
+    yield (t, x, y, vX, vY) + acceleration(vX, vY, c, g)
 
     counter = 1
     #Loop until the y-displacement becomes negative (projectile reaches ground again)
     while True:
-        tHist.append(counter * tStep)   #increment time
-        print("t:  " + str(tHist[counter]))
+        t = counter * tStep     #increment time
 
+        vX0 = vX     #Convenience variable
         #This large hunk is the solution to the net force differential equation in the x-axis
-        # oneOverVX = (1/vXHist[counter-1]) + (((rho*A*Cd*math.cos(thetaHist[counter-1]))/(2*m))*(tStep))   #STABLE
-        # oneOverVX = (1/vXHist[counter-1]) + (((rho*A*Cd)/(2*m))*(tStep))
-        # oneOverVX = (1/vHist[counter-1]) + (((rho*A*Cd*math.cos(thetaHist[counter-1]))/(2*m))*(tStep))
-        oneOverVX = (1/vXHist[counter-1]) + ((rho*A*Cd)/(2*m*math.cos(thetaHist[counter-1]))*(tStep))   #This is one over the solution for velocity in the x-axis net force differential equation
-        vXHist.append(1 / oneOverVX)    #Adding the velocity to the list of velocities
-
-        vY0 = vYHist[counter-1]     #Convenience variable
-        # k = 0.5 * rho * A * Cd * math.sin(abs(thetaHist[counter-1]))  #STABLE
-        # k = 0.5 * rho * A * Cd
-        k = (rho * A * Cd) / (2 * math.sin(abs(thetaHist[counter-1])))  #Convenience variable
-        print("k:  " + str(k))
-        print("vX: " + str(vXHist[counter]))
-        rootGMK = math.sqrt(g*m*k)  #Convenience variable
-        if vYHist[counter-1] > 0.0:     #If the projectile is going upwards
-            #Solving the y-axis differential equation for velocity
-            equationRight = -rootGMK * ((tStep/m) - (math.atan((k*vY0)/(rootGMK))/rootGMK))
-            vYHist.append((math.tan(equationRight) * rootGMK) / k)
-        elif vYHist[counter-1] < 0.0:   #If the projectile is going downwards
-            #Solving the y-axis differential equation for velocity
-
-            # Hand-solved integral
-            # exponent = -(2*tStep*rootGMK)/m
-            # numerator = g*m*math.exp(exponent) - math.exp(exponent)*vY0*rootGMK - vY0*rootGMK - g*m
-            # denominator = math.exp(exponent)*(vY0-rootGMK) - vY0*k - rootGMK
-            # vYHist.append(numerator / denominator)
-
-            #Wolfram Alpha arctanh integral
-            arctanh =(vY0*math.sqrt(k))/(math.sqrt(g*m))
-            print("arctanh: " + str(arctanh))
-            equationRight = (np.arctanh(arctanh))/(rootGMK) - (tStep/m)
-            vYHist.append(np.tanh(rootGMK * equationRight) * ((math.sqrt(g*m))/(math.sqrt(k))))
-        else:   #If current y velocity is 0
-            vYHist.append(vY0 - g*tStep)
-        print("vY: " + str(vYHist[counter]))
-
-        vHist.append(math.hypot(vXHist[counter], vYHist[counter]))  #Calculate the net velocity and add it to the velocities list
-        print("v:  " + str(vHist[counter]))
-        thetaHist.append(math.atan(vYHist[counter]/vXHist[counter]))    #Calculate the current angle based on the velocities and add it to the theta list
-        print("0:  " + str(math.degrees(thetaHist[counter])))
-
-        x0 = xHist[counter-1]
-        y0 = yHist[counter-1]
-
-        # yIntegral = trigintegrate()
-
-        """
-        Note: What I wanted to do here was to integrate the velocity functions over the time interval to find the exact
-        changes in position. Unfortunately, I was running short of time and decided it was not worth it to move forward with
-        this final step, and instead worked on the presentation and testing different cases.
-        """
-        xHist.append(x0 + vXHist[counter]*tStep)    #Calculate new x position using x = x0 + vt
-        yHist.append(y0 + vYHist[counter]*tStep)    #Calculate new y position using y = y0 + vt
-        print("x:  " + str(xHist[counter]))
-        print("y:  " + str(yHist[counter]))
-        print()
-
-        # xHist.append(xHist[counter-1] + vXHist[counter-1]*tStep + 0.5*aXHist[counter-1]*tStep**2)
-        # yHist.append(yHist[counter-1] + vYHist[counter-1]*tStep + 0.5*aYHist[counter-1]*tStep**2)
-        # vXHist.append(vXHist[counter-1] + aXHist[counter-1]*tStep)
-        # vYHist.append(vYHist[counter-1] + aYHist[counter-1]*tStep)
-        # vHist.append(math.hypot(vXHist[counter], vYHist[counter]))
-        #
-        # vTheta = math.atan(vYHist[counter] / vXHist[counter])
-        # xDragAccel = -0.5*rho*Cd*A*vHist[counter]**2*math.cos(vTheta) / m
-        # yDragAccel = -math.copysign(0.5*rho*Cd*A*vHist[counter]**2*math.sin(vTheta) / m, vYHist[counter])
-        #
-        # aXHist.append(xDragAccel)
-        # aYHist.append(-g*tStep + yDragAccel)
-
-        if vYHist[counter-1] > 0.0 and vYHist[counter] < 0.0:   #Check if the projectile has reached it's peak by checking for a critical point
-            print("max height reached at time=" + str(tHist[counter]))
-            # break
-
-        # print("t: " + str(tHist[counter]))
-        # print("x: " + str(xHist[counter]))
-        # print("y: " + str(yHist[counter]))
-        # print("Vx: " + str(vXHist[counter]))
-        # print("Vy: " + str(vYHist[counter]))
-        # print("Ax: " + str(aXHist[counter]))
-        # print("Ay: " + str(aYHist[counter]))
-
-        if yHist[counter] < 0 or counter > 99999:   #End the loop if the projectile has reached the ground (or limit the number of iterations to avoid computer death)
+        # oneOverVX = (1/vX) + (((rho*A*Cd*math.cos(theta))/(2*m))*(tStep))   #STABLE
+        # oneOverVX = (1/vX) + (((rho*A*Cd)/(2*m))*(tStep))
+        kX = (rho*A*Cd)/(2*m*math.cos(theta))   #Convenience variable
+        oneOverVX = (1/vX) + kX*tStep   #This is one over the solution for velocity in the x-axis net force differential equation
+        vX = 1 / oneOverVX
+        x = x + math.log1p(kX*vX0*tStep)/kX     #Integral of vX = 1/(1/vX0 + kX*t) over the time step
+
+        vY0 = vY     #Convenience variable
+        sinTheta = math.sin(abs(theta))
+        if sinTheta < SMALL_ANGLE:   #If the projectile moves (almost) horizontally
+            #k below divides by sin(theta), but k*vY^2 tends to the linear drag (rho*A*Cd*v/2)*vY, which
+            #decays vY exponentially towards the terminal velocity -g/rate
+            rate = (rho*A*Cd*math.hypot(vX0, vY0))/(2*m)
+            decay = -math.expm1(-rate*tStep)    #1 - exp(-rate*tStep)
+            terminal = g/rate
+            vY = vY0 - (vY0 + terminal)*decay
+            y = y + (vY0 + terminal)*decay/rate - terminal*tStep
+        else:
+            # k = 0.5 * rho * A * Cd * math.sin(abs(theta))  #STABLE
+            # k = 0.5 * rho * A * Cd
+            k = (rho * A * Cd) / (2 * sinTheta)  #Convenience variable
+            rootGMK = math.sqrt(g*m*k)  #Convenience variable
+            omega = rootGMK/m       #Convenience variable
+            terminal = rootGMK/k    #Terminal speed sqrt(g*m/k)
+            fall = tStep    #Time spent going downwards during this step
+            if vY0 > 0.0:     #If the projectile is going upwards
+                #Solving the y-axis differential equation for velocity, up to the apex if it is inside the step
+                phi0 = math.atan((k*vY0)/(rootGMK))
+                rise = min(tStep, phi0/omega)
+                fall = tStep - rise
+                equationRight = phi0 - omega*rise
+                vY = (math.tan(equationRight) * rootGMK) / k
+                y = y + (m/k)*math.log(math.cos(equationRight)/math.cos(phi0))     #Integral of the tan solution
+            if fall > 0.0:   #If the projectile is going downwards (from vY, which is 0 after the apex)
+                #Solving the y-axis differential equation for velocity with the speed s = -vY, which
+                #approaches the terminal speed: s = terminal*tanh(...) from below, terminal*coth(...) from above
+                speed = -vY
+                if speed < terminal:
+                    psi0 = math.atanh(speed/terminal)
+                    vY = -terminal*math.tanh(psi0 + omega*fall)
+                    y = y - (m/k)*(logCosh(psi0 + omega*fall) - logCosh(psi0))     #Integral of the tanh solution
+                elif speed > terminal:
+                    chi0 = math.atanh(terminal/speed)
+                    vY = -terminal/math.tanh(chi0 + omega*fall)
+                    y = y - (m/k)*(logSinh(chi0 + omega*fall) - logSinh(chi0))     #Integral of the coth solution
+                else:
+                    y = y - terminal*fall
+
+        theta = math.atan(vY/vX)    #Calculate the current angle based on the velocities
+
+        yield (t, x, y, vX, vY) + acceleration(vX, vY, c, g)
+
+        if y < 0 or counter > maxSteps - 1:   #End the loop if the projectile has reached the ground (or limit the number of iterations to avoid computer death)
             break
 
         counter += 1
 
-    plotData()
-
-
-def plotData():
-    plt.plot(tHist, xHist, marker='o', markersize=2, label='x')
-    plt.plot(tHist, yHist, marker='o', markersize=2, label='y')
-    plt.grid()
-    plt.xlabel('time')
-    plt.legend()
-    plt.show()
-
-    plt.plot(xHist, yHist, marker='o', markersize=2, label='position')
-    plt.grid()
-    plt.xlabel('x')
-    plt.ylabel('y')
-    plt.show()
-
-    for i in range(len(thetaHist)):
-        thetaHist[i] = math.degrees(thetaHist[i])
-    plt.plot(tHist, thetaHist, marker='o', markersize=2, label='theta')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('theta')
-    plt.legend()
-    plt.show()
-
-
-    plt.plot(tHist, vXHist, marker='o', markersize=2, label='x velocity')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('x velocity')
-    plt.show()
-
-    plt.plot(tHist, vYHist, marker='o', markersize=2, label='y velocity')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('y velocity')
-    plt.show()
+
+def logCosh(u):
+    """
+    Returns log(cosh(u)) without overflowing for large |u|.
+    """
+    u = abs(u)
+    return u + math.log1p(math.exp(-2*u)) - LOG2
+
+
+def logSinh(u):
+    """
+    Returns log(sinh(u)) for u > 0 without overflowing for large u.
+    """
+    return u + math.log(-math.expm1(-2*u)) - LOG2
+
+
+def plotData(trajectory, path=None):
+    plotTrajectory(trajectory, PANELS, path)
 
 
 if __name__ == "__main__":  #Run the main function
@@ -0,0 +1,192 @@
+import numpy as np  #Math library
+import math     #python's math module
+import hashlib
+import json
+import os
+from scipy.interpolate import RectBivariateSpline, CubicSpline
+from scipy.optimize import minimize_scalar
+from DragModel import dragConstant
+from OptimalAngleTable import DEFAULT_CACHE_DIR
+from RungeKuttaKinematics import integrateAdaptive
+from Trajectory import Trajectory
+
+FIELDS = ('range', 'apex', 'apexTime', 'flightTime', 'impactVX', 'impactVY')   #Dimensionless results stored in the table
+VERSION = 1     #Bump when the solver changes so old cached tables are not reused
+
+#Every solver integrates dv/dt = -c*|v|*v - g with v(0) = v0*(cos(theta), sin(theta)), where
+#c = rho*Cd*A/(2m). Measuring lengths in v0^2/g, times in v0/g and velocities in v0 turns this into
+#    dV/dtau = -kappa*|V|*V - (0, 1),    V(0) = (cos(theta), sin(theta)),    kappa = c*v0^2/g
+#so every shot is one member of a two-parameter family (theta, kappa), and m, rho, A, Cd, v0 and g
+#only matter through kappa and the scales.
+
+
+def dimensionlessDrag(v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8):
+    """
+    Returns kappa = rho*Cd*A/(2m) * v0^2/g, the drag constant in units of the launch speed and gravity
+    (it is also the ratio v0^2 / terminal speed^2). Works on scalars and arrays.
+
+    Units: kg, m, sec, rad
+    """
+    return dragConstant(rho, Cd, A, m) * v0**2 / g
+
+
+def integrateDimensionless(theta, kappa, rtol=1e-10, atol=1e-12):
+    """
+    Integrates the dimensionless equation with adaptive RK45 steps (exact apex and impact) and
+    returns it as a Trajectory in units of v0^2/g, v0/g and v0. Use rescale to get physical units.
+    """
+    #m = A = Cd = 1 and rho = 2*kappa make RungeKuttaKinematics use exactly c = kappa, with v0 = g = 1
+    return integrateAdaptive(1.0, theta, 1.0, 2*kappa, 1.0, 1.0, 1.0, rtol=rtol, atol=atol)
+
+
+def rescale(trajectory, v0, g=9.8):
+    """
+    Returns a dimensionless Trajectory (from integrateDimensionless) in physical units for a launch
+    speed v0 and gravity g, including its continuous extension.
+
+    Units: kg, m, sec, rad
+    """
+    length, time = v0**2 / g, v0 / g
+    scale = np.array([time, length, length, v0, v0, g, g])     #Of the columns t, x, y, vX, vY, aX, aY
+    apex = (trajectory.apexTime * time, math.nan, trajectory.apex * length, math.nan, math.nan)
+    impact = (trajectory.flightTime * time, trajectory.range * length, 0.0) + tuple(v * v0 for v in trajectory.impactVelocity)
+    dense = None
+    if trajectory.dense is not None:
+        coefficients, fullSteps = trajectory.dense
+        dense = (coefficients * np.array([v0, v0, g, g]), fullSteps * time)    #Position terms scale like v0, velocity terms like g
+    return Trajectory(trajectory.data * scale, trajectory.steps, trajectory.evaluations, trajectory.rejected, apex, impact, dense)
+
+
+class DimensionlessTable:
+    """
+    Dimensionless range, apex, apex time, flight time and impact velocity over a grid of launch angle
+    theta and dimensionless drag kappa, plus the optimal angle and maximum range as functions of kappa.
+
+    Once built, any shot (v0, m, rho, A, Cd, g, theta) is a bicubic spline lookup plus rescaling, so
+    a sweep over five or six physical parameters costs no integrations at all. The kappa axis is
+    uniform in log(1 + kappa) and the angle axis in log(tan(theta)), which crowds points towards
+    flat and vertical shots, where the results change fastest, and the splines interpolate the log of
+    every field (they are all positive, except impactVY, which is stored as log(-impactVY)). That
+    keeps the interpolation error below about 5e-5 relative (1e-6 typical) for angles between
+    minTheta and pi/2 - minTheta. The table is saved as .npy files in cacheDir (named after a hash of the grid and solver settings)
+    and loaded from there next time, like OptimalAngleTable.
+
+    Units: kg, m, sec, rad
+    """
+
+    def __init__(self, thetas, kappas, values, optimal):
+        self.thetas = np.asarray(thetas)
+        self.kappas = np.asarray(kappas)
+        self.values = np.asarray(values)        #Shape (thetas, kappas, len(FIELDS))
+        self.optimal = np.asarray(optimal)      #Shape (kappas, 2): optimal angle, maximum dimensionless range
+        u = np.log(np.tan(self.thetas))
+        q = np.log1p(self.kappas)
+        self.splines = [RectBivariateSpline(u, q, np.log(np.abs(self.values[:, :, i])), kx=3, ky=3) for i in range(len(FIELDS))]
+        self.optimalSplines = [CubicSpline(q, self.optimal[:, i]) for i in range(2)]
+
+    @classmethod
+    def load(cls, thetaPoints=65, kappaPoints=41, minTheta=1e-4, maxKappa=1000.0, rtol=1e-10, cacheDir=DEFAULT_CACHE_DIR):
+        """
+        Returns the table for the given grid and solver tolerance, building and saving it first if it
+        is not in cacheDir yet. Building takes thetaPoints*kappaPoints RK45 runs.
+        """
+        settings = {'thetaPoints': thetaPoints, 'kappaPoints': kappaPoints, 'minTheta': minTheta, 'maxKappa': maxKappa, 'rtol': rtol, 'version': VERSION}
+        key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+        valuesPath = os.path.join(cacheDir, key + '-dimensionless.npy')
+        optimalPath = os.path.join(cacheDir, key + '-dimensionless-optimal.npy')
+
+        u = math.log(math.tan(minTheta))
+        thetas = np.arctan(np.exp(np.linspace(u, -u, thetaPoints)))    #Symmetric about 45 degrees in log(tan(theta))
+        kappas = np.expm1(np.linspace(0.0, math.log1p(maxKappa), kappaPoints))
+        if not (os.path.exists(valuesPath) and os.path.exists(optimalPath)):
+            values, optimal = cls.compute(thetas, kappas, rtol)
+            os.makedirs(cacheDir, exist_ok=True)
+            #Write under a temporary name first so a crash never leaves a half-written table behind
+            for path, array in ((valuesPath, values), (optimalPath, optimal)):
+                np.save(path + '.tmp.npy', array)
+                os.replace(path + '.tmp.npy', path)
+
+        return cls(thetas, kappas, np.load(valuesPath), np.load(optimalPath))
+
+    @staticmethod
+    def compute(thetas, kappas, rtol):
+        """
+        Integrates every grid point and searches the optimal angle of every kappa. Returns the values
+        (thetas, kappas, len(FIELDS)) and the optimal angles and ranges (kappas, 2).
+        """
+        values = np.empty((len(thetas), len(kappas), len(FIELDS)))
+        optimal = np.empty((len(kappas), 2))
+        for j, kappa in enumerate(kappas):
+            for i, theta in enumerate(thetas):
+                trajectory = integrateDimensionless(theta, kappa, rtol)
+                values[i, j] = (trajectory.range, trajectory.apex, trajectory.apexTime, trajectory.flightTime) + trajectory.impactVelocity
+            result = minimize_scalar(lambda theta: -integrateDimensionless(theta, kappa, rtol).range, bounds=(0.0, math.pi/2), method='bounded', options={'xatol': 1e-8})
+            optimal[j] = (result.x, -result.fun)
+        return values, optimal
+
+    def checkRange(self, theta, kappa):
+        if np.any(kappa < 0) or np.any(kappa > self.kappas[-1]):
+            raise ValueError("kappa is outside the table range [0, " + str(self.kappas[-1]) + "]")
+        if theta is not None and (np.any(theta < self.thetas[0]) or np.any(theta > self.thetas[-1])):
+            raise ValueError("theta is outside the table range [" + str(self.thetas[0]) + ", " + str(self.thetas[-1]) + "]")
+
+    def lookup(self, theta, kappa):
+        """
+        Interpolates the dimensionless results at launch angles theta and drags kappa (scalars or
+        arrays, broadcast against each other). Returns a dict from the names in FIELDS to arrays.
+        """
+        theta, kappa = np.broadcast_arrays(np.asarray(theta, dtype=float), np.asarray(kappa, dtype=float))
+        self.checkRange(theta, kappa)
+        u = np.log(np.tan(theta))
+        q = np.log1p(kappa)
+        result = {name: np.exp(spline.ev(u, q)) for name, spline in zip(FIELDS, self.splines)}
+        result['impactVY'] = -result['impactVY']
+        return result
+
+    def shot(self, theta, v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8):
+        """
+        Returns the range, apex, apexTime, flightTime, impactVX and impactVY of shots in physical units,
+        as a dict of arrays. Every argument may be a scalar or an array.
+
+        Units: kg, m, sec, rad
+        """
+        v0, g = np.asarray(v0, dtype=float), np.asarray(g, dtype=float)
+        result = self.lookup(theta, dimensionlessDrag(v0, m, rho, A, Cd, g))
+        length, time = v0**2 / g, v0 / g
+        scales = {'range': length, 'apex': length, 'apexTime': time, 'flightTime': time, 'impactVX': v0, 'impactVY': v0}
+        return {name: result[name] * scales[name] for name in FIELDS}
+
+    def optimalAngle(self, v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8):
+        """
+        Returns (optimal launch angle, maximum range) for the given parameters, which may be scalars or
+        arrays. The optimal angle only depends on kappa, so this replaces a search per parameter set
+        with a 1D spline lookup.
+
+        Units: kg, m, sec, rad
+        """
+        v0, g = np.asarray(v0, dtype=float), np.asarray(g, dtype=float)
+        kappa = np.asarray(dimensionlessDrag(v0, m, rho, A, Cd, g))
+        self.checkRange(None, kappa)
+        q = np.log1p(kappa)
+        return self.optimalSplines[0](q), self.optimalSplines[1](q) * v0**2 / g
+
+
+def main():
+    """
+    Compares table lookups with direct simulations for a few shots, and shows that shots with the
+    same kappa have the same optimal angle.
+
+    Units: kg, m, sec, rad
+    """
+    table = DimensionlessTable.load()
+    for v0, m, A, theta in ((30, 1, 0.05, math.radians(45)), (12, 0.3, 0.02, math.radians(20)), (60, 5, 0.3, math.radians(60))):
+        lookup = table.shot(theta, v0, m, A=A)
+        direct = integrateAdaptive(v0, theta, m, 1.225, A, 0.5, 9.8, rtol=1e-10, atol=1e-12)
+        print("v0: " + str(v0) + "  kappa: " + str(dimensionlessDrag(v0, m, A=A)) + "  range (table): " + str(float(lookup['range']))
+              + "  range (direct): " + str(direct.range))
+    angle, maxRange = table.optimalAngle(v0=30, m=np.array([1.0, 2.0]), A=np.array([0.05, 0.1]))
+    print("optimal angles: " + str(angle) + "  ranges: " + str(maxRange))
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
@@ -0,0 +1,110 @@
+import numpy as np  #Math library
+import math     #python's math module
+
+
+def dragConstant(rho, Cd, A, m):
+    """
+    Returns c = rho*Cd*A/(2m), the drag force divided by mass and v^2.
+
+    The drag force equation is 1/2 * rho * Cd * A * v^2, so every drag acceleration in this repository
+    only depends on the physical constants through c.
+
+    Units: kg, m, sec, rad
+    """
+    return 0.5 * rho * Cd * A / m
+
+
+def acceleration(vX, vY, c, g):
+    """
+    Returns the (x, y) acceleration from gravity plus drag for a velocity (vX, vY).
+
+    Drag points against the velocity, so its components are -c*v*vX and -c*v*vY (the same as the
+    v^2*cos(vTheta) / v^2*sin(vTheta) form used in the original scripts whenever vX > 0). Works with
+    plain floats and with numpy arrays alike.
+    """
+    v = (vX*vX + vY*vY) ** 0.5
+    return -c*v*vX, -g - c*v*vY
+
+
+def derivative(state, c, g):
+    """
+    Returns the time derivative of a state (x, y, vX, vY) under gravity plus drag.
+    """
+    x, y, vX, vY = state
+    aX, aY = acceleration(vX, vY, c, g)
+    return vX, vY, aX, aY
+
+
+class ForceModel:
+    """
+    Optional physics on top of the basic drag model, for the batch integrator
+    (BatchKinematics.integrateBatch(..., model=ForceModel(...))) and everything built on it.
+
+    Heights z are measured from the datum the terrain is given in; the projectile starts at
+    z = launchHeight, so y (relative to the launch point) is z - launchHeight.
+
+    wind:           horizontal wind speed (+x) at windHeight, added to the wind argument of the integrator
+    windExponent:   power law wind profile, wind(z) = wind * (z / windHeight)^windExponent above the
+                    ground (0 keeps the wind constant at every height; about 0.14 over open land)
+    scaleHeight:    exponential atmosphere, rho(z) = rho * exp(-z / scaleHeight) where rho is the
+                    density at z = 0 (about 8500 m for air; inf keeps rho constant)
+    launchHeight:   height of the launch point above the datum
+    terrainX, terrainHeight:  ground height at increasing x positions, linearly interpolated in
+                    between and held constant beyond the ends (None: flat ground at z = 0). Use
+                    sampleTerrain to tabulate a function once.
+
+    Everything is plain numbers and arrays, so the compiled kernel can use it without calling back
+    into Python, and the defaults reproduce the basic model exactly.
+
+    Units: kg, m, sec, rad
+    """
+
+    def __init__(self, wind=0.0, windExponent=0.0, windHeight=10.0, scaleHeight=math.inf, launchHeight=0.0, terrainX=None, terrainHeight=None):
+        if (terrainX is None) != (terrainHeight is None):
+            raise ValueError("terrainX and terrainHeight must be given together")
+        self.wind = wind
+        self.windExponent = windExponent
+        self.windHeight = windHeight
+        self.scaleHeight = scaleHeight
+        self.launchHeight = launchHeight
+        self.terrainX = np.empty(0) if terrainX is None else np.asarray(terrainX, dtype=float)
+        self.terrainHeight = np.empty(0) if terrainHeight is None else np.asarray(terrainHeight, dtype=float)
+        if self.terrainX.shape != self.terrainHeight.shape or np.any(np.diff(self.terrainX) <= 0):
+            raise ValueError("terrainX must be increasing and the same length as terrainHeight")
+
+    @classmethod
+    def sampleTerrain(cls, function, xMax, points=1025, xMin=0.0, **kwargs):
+        """
+        Returns a ForceModel whose terrain is function (taking an array of x, returning ground heights)
+        sampled at points evenly spaced positions from xMin to xMax. function is only called here.
+        """
+        terrainX = np.linspace(xMin, xMax, points)
+        return cls(terrainX=terrainX, terrainHeight=function(terrainX), **kwargs)
+
+    @property
+    def hasTerrain(self):
+        return self.terrainX.size > 0
+
+    def windAt(self, wind, z):
+        """
+        Returns the wind speed at heights z for a speed wind at windHeight (arrays or scalars).
+        """
+        if self.windExponent == 0.0:
+            return wind
+        return wind * (np.maximum(z, 0.0) / self.windHeight) ** self.windExponent
+
+    def dragAt(self, c, z):
+        """
+        Returns the drag constant at heights z for a constant c at z = 0 (arrays or scalars).
+        """
+        if self.scaleHeight == math.inf:
+            return c
+        return c * np.exp(-z / self.scaleHeight)
+
+    def terrain(self, x):
+        """
+        Returns the ground height at positions x.
+        """
+        if not self.hasTerrain:
+            return np.zeros_like(np.asarray(x, dtype=float))
+        return np.interp(x, self.terrainX, self.terrainHeight)
@@ -1,164 +1,152 @@
-# matplotlib 3.3.1
-import matplotlib.pyplot as plt     #Plotting Library
 import numpy as np      #Math Library
 import math     #python's math module
-
-def main():
+from DragModel import dragConstant, acceleration
+from RungeKuttaKinematics import integrateAdaptive
+from Trajectory import Trajectory, allocate, grow
+from Profiling import finish, profiled
+from Plotting import plotTrajectory
+from JitKernels import useNumba, eulerKernel
+
+def main(adaptive=False, tracer=None, plotPath=None):
     """
     This script takes any initial values and constants and calculates and plots the trajectory
     of an object assuming constant gravitational force and typical drag force equation.
 
     Uses the Euler method, assuming that acceleration is constant between time intervals.
+    With adaptive=True the fixed tStep loop is replaced by adaptive RK45 steps that find the
+    apex and the ground impact exactly (see RungeKuttaKinematics.integrateAdaptive).
+
+    Steps are not printed; pass a Tracing.StepTracer (e.g. StepTracer(PrintSink())) to see them.
+    With plotPath the plots are written to that file instead of shown (see Plotting.plotTrajectory).
 
     Units: kg, m, sec, rad
     """
     #Drag Force Equation: 1/2 * rho * Cd * A * v^2
 
     #User-Defined Constants
-    global m
-    global v0
-    global theta
-    global rho  #Fluid Density
-    global A    #Cross-sectional Area
-    global Cd   #Drag coefficient
-    global tStep
-    global g
-
     m = 1
     v0 = 30
     theta = math.radians(45)
-    rho = 1.225
-    A = 0.05
-    Cd = 0.5    #A ball is approx. 0.5
+    rho = 1.225     #Fluid Density
+    A = 0.05        #Cross-sectional Area
+    Cd = 0.5        #Drag coefficient, a ball is approx. 0.5
     tStep = 0.005
     g = 9.8
 
+    if adaptive:
+        #Adaptive-step mode: the apex and ground impact are root-found instead of overshot
+        trajectory = integrateAdaptive(v0, theta, m, rho, A, Cd, g, tracer=tracer)
+        print("max height reached at time=" + str(trajectory.apexTime))
+        print("steps: " + str(trajectory.steps) + " (" + str(trajectory.rejected) + " rejected)")
+    else:
+        trajectory = integrateEuler(v0, theta, m, rho, A, Cd, g, tStep, tracer=tracer)
+        print("max height reached at time=" + str(trajectory.apexTime))
 
-    #Data Structures
-    global tHist
-    global xHist
-    global yHist
-    global vHist
-    global vXHist
-    global vYHist
-    global aXHist
-    global aYHist
-    tHist = []      #list for all time steps
-    xHist = []      #list for all x position steps
-    yHist = []      #list for all y position steps
-    vHist = []      #list for all velocities at every time step
-    vXHist = []     #list for all x-axis velocities at every time step
-    vYHist = []     #list for all y-axis velocities at every time step
-    aXHist = []     #list for all x-axis accelerations at every time step
-    aYHist = []     #list for all y-axis accelerations at every time step
+    plotData(trajectory, plotPath)
 
-    #Initialize initial values
-    tHist.append(0.0)
-    xHist.append(0.0)
-    yHist.append(0.0)
-    vHist.append(v0)
-    vXHist.append(v0 * math.cos(theta))
-    vYHist.append(v0 * math.sin(theta))
-    vTheta = math.atan(vYHist[0] / vXHist[0])
-    aXHist.append(-0.5*rho*Cd*A*vHist[0]**2*math.cos(vTheta) / m)
-    aYHist.append(-g - 0.5*rho*Cd*A*vHist[0]**2*math.sin(vTheta) / m)
-    # print("t: " + str(tHist[0]))
-    # print("x: " + str(xHist[0]))
-    # print("y: " + str(yHist[0]))
-    # print("Vx: " + str(vXHist[0]))
-    # print("Vy: " + str(vYHist[0]))
-    # print("Ax: " + str(aXHist[0]))
-    # print("Ay: " + str(aYHist[0]))
 
+@profiled
+def integrateEuler(v0, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.005, maxSteps=100000, tracer=None, backend='python', profiler=None):
+    """
+    Integrates a trajectory with the Euler method until the y-displacement becomes negative, and
+    returns it as a Trajectory. If a tracer (Tracing.StepTracer) is given, every sample is recorded to it.
+
+    With backend='numba' (or 'auto') the loop runs as the compiled JitKernels.eulerKernel when numba
+    is installed, and otherwise collects the samples of the pure-Python streamEuler loop.
+
+    A Profiling.Profiler passed as profiler times the setup, integration, events and output phases.
+
+    Units: kg, m, sec, rad
+    """
+    if profiler is not None:
+        profiler.begin('euler', 'numba' if useNumba(backend) else 'python')
+    c = dragConstant(rho, Cd, A, m)     #Drag force divided by mass and v^2
+    data = allocate(v0, theta, g, tStep, maxSteps)     #Rows of t, x, y, vX, vY, aX, aY
+    if profiler is not None:
+        profiler.mark('setup')
+
+    if useNumba(backend):
+        counter = eulerKernel(v0, theta, c, g, tStep, maxSteps, data)
+        while counter < 0:
+            data = np.empty((2 * data.shape[0], data.shape[1]))
+            counter = eulerKernel(v0, theta, c, g, tStep, maxSteps, data)
+        if profiler is not None:
+            profiler.mark('integration')
+        if tracer is not None:
+            for row in data[:counter+1]:
+                tracer.record(row)
+            tracer.flush()
+        if profiler is not None:
+            profiler.mark('output')
+        return finish(Trajectory(data[:counter+1], counter, counter + 1), profiler, 'events')
+
+    for counter, row in enumerate(streamEuler(v0, theta, m, rho, A, Cd, g, tStep, maxSteps)):
+        if counter == data.shape[0]:
+            data = grow(data)
+        data[counter] = row
+        if tracer is not None:
+            tracer.record(data[counter])
+
+    if profiler is not None:
+        profiler.mark('integration')
+    if tracer is not None:
+        tracer.flush()
+    if profiler is not None:
+        profiler.mark('output')
+    return finish(Trajectory(data[:counter+1], counter, counter + 1), profiler, 'events')
+
+
+def streamEuler(v0, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.005, maxSteps=100000):
+    """
+    Generator version of integrateEuler: yields every sample as a (t, x, y, vX, vY, aX, aY) tuple as
+    soon as it is computed, ending with the first sample below ground, and keeps nothing else. See
+    Streaming for decimation, fixed-size blocks and summary-only runs in constant memory.
+
+    Units: kg, m, sec, rad
+    """
+    c = dragConstant(rho, Cd, A, m)     #Drag force divided by mass and v^2
+
+    #Initialize initial values
+    t = 0.0
+    x = 0.0
+    y = 0.0
+    vX = v0 * math.cos(theta)
+    vY = v0 * math.sin(theta)
+    aX, aY = acceleration(vX, vY, c, g)
+    yield (t, x, y, vX, vY, aX, aY)
+
+    tSquared = tStep**2     #temporary, convenience variable
     counter = 1
     #Loop until the y-displacement becomes negative (projectile reaches ground again)
     while True:
-        tHist.append(counter * tStep)   #increment time
-        vXHist.append(vXHist[counter-1] + aXHist[counter-1]*tStep)  #calculate new x velocity using v = v0 + at
-        vYHist.append(vYHist[counter-1] + aYHist[counter-1]*tStep)  #calculate new x velocity using v = v0 + at
-        vHist.append(math.hypot(vXHist[counter], vYHist[counter]))   #calculate new net velocity from x and y velocities
-
-        vTheta = math.atan(vYHist[counter] / vXHist[counter])   #calculates current angle of motion using arctan
-        vSquared = vHist[counter]**2    #temporary, convenience variable
-        xDragAccel = -0.5*rho*Cd*A*vSquared*math.cos(vTheta) / m                                    #calculation for acceleration due to drag in the x-axis
-        yDragAccel = -math.copysign(0.5*rho*Cd*A*vSquared*math.sin(vTheta) / m, vYHist[counter])    #calculation for net acceleration in the y-axis
+        t = counter * tStep     #increment time
+        vX = vX + aX*tStep      #calculate new x velocity using v = v0 + at
+        vY = vY + aY*tStep      #calculate new y velocity using v = v0 + at
+        aX, aY = acceleration(vX, vY, c, g)     #calculation for net acceleration from gravity and drag (shared with the other solvers)
 
         #This velocity calculation is incorrect; double counts cos and sin
-        # vXSquared = vXHist[counter]**2
-        # vYSquared = vYHist[counter]**2
+        # vXSquared = vX**2
+        # vYSquared = vY**2
         # xDragAccel = -0.5*rho*Cd*A*vXSquared / m
-        # yDragAccel = -math.copysign(0.5*rho*Cd*A*vYSquared / m, vYHist[counter])
-
-        #Add the accelerations to their respective lists
-        aXHist.append(xDragAccel)
-        aYHist.append(-g + yDragAccel)
+        # yDragAccel = -math.copysign(0.5*rho*Cd*A*vYSquared / m, vY)
 
-        tSquared = tStep**2     #temporary, convenience variable
-        xHist.append(xHist[counter-1] + vXHist[counter]*tStep + 0.5*aXHist[counter]*tSquared)   #x = x0 + v0t + 1/2 * at^2
-        yHist.append(yHist[counter-1] + vYHist[counter]*tStep + 0.5*aYHist[counter]*tSquared)   #y = y0 + v0t + 1/2 * at^2
+        x = x + vX*tStep + 0.5*aX*tSquared      #x = x0 + v0t + 1/2 * at^2
+        y = y + vY*tStep + 0.5*aY*tSquared      #y = y0 + v0t + 1/2 * at^2
 
-        # xHist.append(xHist[counter-1] + vXHist[counter]*tStep)
-        # yHist.append(yHist[counter-1] + vYHist[counter]*tStep)
+        # x = x + vX*tStep
+        # y = y + vY*tStep
 
-        if vYHist[counter-1] > 0.0 and vYHist[counter] < 0.0:   #Find when the max height has been reached by finding a critical point
-            print("max height reached at time=" + str(tHist[counter]))
+        yield (t, x, y, vX, vY, aX, aY)
 
-        print("t:  " + str(tHist[counter]))
-        print("x:  " + str(xHist[counter]))
-        print("y:  " + str(yHist[counter]))
-        print("0:  " + str(vTheta))
-        print("Vx: " + str(vXHist[counter]))
-        print("Vy: " + str(vYHist[counter]))
-        print("Ax: " + str(aXHist[counter]))
-        print("Ay: " + str(aYHist[counter]))
-        print("")
-
-        if yHist[counter] < 0 or counter > 99999:   #End the loop if the projectile has reached the ground (or limit the number of iterations to avoid computer death)
+        if y < 0 or counter > maxSteps - 1:   #End the loop if the projectile has reached the ground (or limit the number of iterations to avoid computer death)
             break
 
         counter += 1
 
-    plotData()
-
-
-def plotData():
-    print("t: " + str(tHist[len(tHist)-1]))
-    plt.plot(tHist, xHist, marker='o', markersize=2, label='x')
-    plt.plot(tHist, yHist, marker='o', markersize=2, label='y')
-    plt.grid()
-    plt.xlabel('time')
-    plt.legend()
-    plt.show()
-
-    plt.plot(xHist, yHist, marker='o', markersize=2, label='position')
-    plt.grid()
-    plt.xlabel('x')
-    plt.ylabel('y')
-    plt.show()
-
-    plt.plot(tHist, vXHist, marker='o', markersize=2, label='x velocity')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('x velocity')
-    plt.show()
-
-    plt.plot(tHist, aXHist, marker='o', markersize=2, label='x acceleration')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('x acceleration')
-    plt.show()
-
-    plt.plot(tHist, vYHist, marker='o', markersize=2, label='y velocity')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('y velocity')
-    plt.show()
-
-    plt.plot(tHist, aYHist, marker='o', markersize=2, label='y acceleration')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('y acceleration')
-    plt.show()
+
+def plotData(trajectory, path=None):
+    print("t: " + str(trajectory.t[-1]))
+    plotTrajectory(trajectory, path=path)     #Every column against time, and the path; saved to path instead of shown if given
 
 
 if __name__ == "__main__":  #Run the main function
@@ -0,0 +1,320 @@
+import numpy as np  #Math library
+import math     #python's math module
+
+try:
+    import numba
+except ImportError:     #numba is optional; every caller falls back to its pure-Python/numpy path
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+#The compiled kernels do the same floating point operations in the same order as the reference
+#implementations, but not always with the same library calls: the speed in eulerKernel is a sqrt where
+#DragModel.acceleration computes ** 0.5 (pow) on Python floats, a ForceModel's wind profile and
+#atmosphere use pow/exp, and customKernel uses libm's log/tan/tanh. Each of those may differ in the last
+#bit, so the guarantee for every kernel is that its columns agree with the reference to within
+#TOLERANCE relative to each column's largest magnitude (see deviation and Benchmark.checkKernels).
+#In practice the batch kernel without a ForceModel is bit-identical, since numpy's ** 0.5 is a sqrt.
+TOLERANCE = 1e-12
+SMALL_ANGLE = 1e-9  #Same as CustomKinematics.SMALL_ANGLE (JitKernels cannot import it without a cycle)
+LOG2 = math.log(2)
+
+
+def njit(function):
+    """
+    Compiles function in nopython mode with the GIL released (so threads can run kernels in parallel),
+    or returns it unchanged when numba is not installed.
+    """
+    if numba is None:
+        return function
+    return numba.njit(nogil=True, cache=True)(function)
+
+
+def deviation(reference, compiled):
+    """
+    Returns the largest difference between two arrays of samples (rows of the same columns), relative
+    to the largest magnitude of each column of reference. Compiled results must stay below TOLERANCE.
+    """
+    reference = np.asarray(reference, dtype=float).reshape(len(reference), -1)
+    compiled = np.asarray(compiled, dtype=float).reshape(len(compiled), -1)
+    if reference.shape != compiled.shape:
+        return math.inf
+    scale = np.max(np.abs(reference), axis=0)
+    scale[scale == 0] = 1.0
+    return float(np.max(np.abs(reference - compiled) / scale)) if reference.size else 0.0
+
+
+def useNumba(backend):
+    """
+    Resolves a backend argument: 'numba' or 'auto' use the compiled kernels if numba is installed,
+    'python' never does.
+    """
+    if backend not in ('python', 'numba', 'auto'):
+        raise ValueError("unknown backend: " + str(backend) + " (expected 'python', 'numba' or 'auto')")
+    return backend != 'python' and HAVE_NUMBA
+
+
+@njit
+def eulerKernel(v0, theta, c, g, tStep, maxSteps, data):
+    """
+    Compiled version of the EulerKinematics.integrateEuler loop. Fills rows of data (t, x, y, vX, vY,
+    aX, aY) and returns the index of the last row written, or -1 if data filled up before landing.
+    """
+    t = 0.0
+    x = 0.0
+    y = 0.0
+    vX = v0 * math.cos(theta)
+    vY = v0 * math.sin(theta)
+    v = math.sqrt(vX*vX + vY*vY)
+    aX = -c*v*vX
+    aY = -g - c*v*vY
+    data[0, 0] = t
+    data[0, 1] = x
+    data[0, 2] = y
+    data[0, 3] = vX
+    data[0, 4] = vY
+    data[0, 5] = aX
+    data[0, 6] = aY
+
+    tSquared = tStep**2
+    counter = 1
+    while True:
+        if counter == data.shape[0]:
+            return -1
+        t = counter * tStep
+        vX = vX + aX*tStep
+        vY = vY + aY*tStep
+        v = math.sqrt(vX*vX + vY*vY)
+        aX = -c*v*vX
+        aY = -g - c*v*vY
+        x = x + vX*tStep + 0.5*aX*tSquared
+        y = y + vY*tStep + 0.5*aY*tSquared
+        data[counter, 0] = t
+        data[counter, 1] = x
+        data[counter, 2] = y
+        data[counter, 3] = vX
+        data[counter, 4] = vY
+        data[counter, 5] = aX
+        data[counter, 6] = aY
+        if y < 0 or counter > maxSteps - 1:
+            return counter
+        counter += 1
+
+
+@njit
+def logCosh(u):
+    """
+    Compiled version of CustomKinematics.logCosh.
+    """
+    u = abs(u)
+    return u + math.log1p(math.exp(-2*u)) - LOG2
+
+
+@njit
+def logSinh(u):
+    """
+    Compiled version of CustomKinematics.logSinh.
+    """
+    return u + math.log(-math.expm1(-2*u)) - LOG2
+
+
+@njit
+def customKernel(v0, theta, m, rho, A, Cd, g, tStep, maxSteps, data):
+    """
+    Compiled version of the CustomKinematics.integrateCustom loop. Fills rows of data and returns the
+    index of the last row written, or -1 if data filled up before landing.
+    """
+    c = 0.5 * rho * Cd * A / m
+    x = 0.0
+    y = 0.0
+    vX = v0 * math.cos(theta)
+    vY = v0 * math.sin(theta)
+    v = math.sqrt(vX*vX + vY*vY)
+    data[0, 0] = 0.0
+    data[0, 1] = x
+    data[0, 2] = y
+    data[0, 3] = vX
+    data[0, 4] = vY
+    data[0, 5] = -c*v*vX
+    data[0, 6] = -g - c*v*vY
+
+    counter = 1
+    while True:
+        if counter == data.shape[0]:
+            return -1
+        t = counter * tStep
+        vX0 = vX
+        kX = (rho*A*Cd)/(2*m*math.cos(theta))
+        oneOverVX = (1/vX) + kX*tStep
+        vX = 1 / oneOverVX
+        x = x + math.log1p(kX*vX0*tStep)/kX
+
+        vY0 = vY
+        sinTheta = math.sin(abs(theta))
+        if sinTheta < SMALL_ANGLE:
+            rate = (rho*A*Cd*math.hypot(vX0, vY0))/(2*m)
+            decay = -math.expm1(-rate*tStep)
+            terminal = g/rate
+            vY = vY0 - (vY0 + terminal)*decay
+            y = y + (vY0 + terminal)*decay/rate - terminal*tStep
+        else:
+            k = (rho * A * Cd) / (2 * sinTheta)
+            rootGMK = math.sqrt(g*m*k)
+            omega = rootGMK/m
+            terminal = rootGMK/k
+            fall = tStep
+            if vY0 > 0.0:
+                phi0 = math.atan((k*vY0)/(rootGMK))
+                rise = min(tStep, phi0/omega)
+                fall = tStep - rise
+                equationRight = phi0 - omega*rise
+                vY = (math.tan(equationRight) * rootGMK) / k
+                y = y + (m/k)*math.log(math.cos(equationRight)/math.cos(phi0))
+            if fall > 0.0:
+                speed = -vY
+                if speed < terminal:
+                    psi0 = math.atanh(speed/terminal)
+                    u = psi0 + omega*fall
+                    vY = -terminal*math.tanh(u)
+                    y = y - (m/k)*(logCosh(u) - logCosh(psi0))
+                elif speed > terminal:
+                    chi0 = math.atanh(terminal/speed)
+                    u = chi0 + omega*fall
+                    vY = -terminal/math.tanh(u)
+                    y = y - (m/k)*(logSinh(u) - logSinh(chi0))
+                else:
+                    y = y - terminal*fall
+
+        theta = math.atan(vY/vX)
+        v = math.sqrt(vX*vX + vY*vY)
+        data[counter, 0] = t
+        data[counter, 1] = x
+        data[counter, 2] = y
+        data[counter, 3] = vX
+        data[counter, 4] = vY
+        data[counter, 5] = -c*v*vX
+        data[counter, 6] = -g - c*v*vY
+        if y < 0 or counter > maxSteps - 1:
+            return counter
+        counter += 1
+
+
+@njit
+def windAt(wind, z, exponent, height):
+    """
+    Compiled version of DragModel.ForceModel.windAt for one lane.
+    """
+    if exponent == 0.0:
+        return wind
+    return wind * (max(z, 0.0) / height) ** exponent
+
+
+@njit
+def dragAt(c, z, scaleHeight):
+    """
+    Compiled version of DragModel.ForceModel.dragAt for one lane.
+    """
+    if scaleHeight == math.inf:
+        return c
+    return c * math.exp(-z / scaleHeight)
+
+
+@njit
+def terrainAt(x, terrainX, terrainHeight):
+    """
+    Ground height at x, interpolated like np.interp (constant beyond the ends of the table).
+    """
+    if x <= terrainX[0]:
+        return terrainHeight[0]
+    last = terrainX.shape[0] - 1
+    if x >= terrainX[last]:
+        return terrainHeight[last]
+    i = np.searchsorted(terrainX, x, side='right') - 1
+    slope = (terrainHeight[i+1] - terrainHeight[i]) / (terrainX[i+1] - terrainX[i])
+    return slope*(x - terrainX[i]) + terrainHeight[i]
+
+
+@njit
+def eulerBatchKernel(theta, v0, c, g, h, wind, stopX, floor, maxSteps, windExponent, windHeight, scaleHeight, launchHeight, terrainX, terrainHeight, out):
+    """
+    Compiled version of BatchKinematics.integrateBatch. Runs each lane's Euler loop to completion one
+    lane at a time, and writes the columns of BATCH_COLUMNS into out (shape (lanes, 16)). The
+    arguments after maxSteps are the fields of a DragModel.ForceModel (terrainX empty for flat ground).
+    """
+    terrain = terrainX.shape[0] > 0
+    for lane in range(theta.shape[0]):
+        vX = v0[lane] * math.cos(theta[lane])
+        vY = v0[lane] * math.sin(theta[lane])
+        x = 0.0
+        y = 0.0
+        cLane = c[lane]
+        gLane = g[lane]
+        hLane = h[lane]
+        windLane = wind[lane]
+        stopLane = stopX[lane]
+        floorLane = floor[lane]
+        relX = vX - windAt(windLane, launchHeight, windExponent, windHeight)
+        cNow = dragAt(cLane, launchHeight, scaleHeight)
+        v = math.sqrt(relX*relX + vY*vY)
+        aX = -cNow*v*relX
+        aY = -gLane - cNow*v*vY
+        ground = floorLane + terrainAt(x, terrainX, terrainHeight) if terrain else floorLane
+        groundPrev = ground
+        apex = 0.0
+        apexTime = 0.0
+        hSquared = hLane*hLane
+        counter = 1
+        while True:
+            t = counter * hLane
+            vXPrev = vX
+            vYPrev = vY
+            vX = vX + aX*hLane
+            vY = vY + aY*hLane
+            relX = vX - windAt(windLane, y + launchHeight, windExponent, windHeight)
+            cNow = dragAt(cLane, y + launchHeight, scaleHeight)
+            v = math.sqrt(relX*relX + vY*vY)
+            aX = -cNow*v*relX
+            aY = -gLane - cNow*v*vY
+            xPrev = x
+            yPrev = y
+            x = x + vX*hLane + 0.5*aX*hSquared
+            y = y + vY*hLane + 0.5*aY*hSquared
+            if y > apex:
+                apex = y
+                apexTime = t
+            if terrain:
+                groundPrev = ground
+                ground = floorLane + terrainAt(x, terrainX, terrainHeight)
+            if y < ground or x >= stopLane or counter > maxSteps - 1:
+                break
+            counter += 1
+
+        landed = y < ground
+        if not landed:
+            fraction = 1.0
+        elif terrain:
+            fraction = (yPrev - groundPrev) / ((yPrev - groundPrev) - (y - ground))
+        else:
+            fraction = (yPrev - floorLane) / (yPrev - y)
+        if x >= stopLane and (not landed or (stopLane - xPrev) / (x - xPrev) < fraction):     #Whichever crossing comes first
+            fraction = (stopLane - xPrev) / (x - xPrev)
+            landed = False
+        out[lane, 0] = t
+        out[lane, 1] = x
+        out[lane, 2] = y
+        out[lane, 3] = vX
+        out[lane, 4] = vY
+        out[lane, 5] = aX
+        out[lane, 6] = aY
+        out[lane, 7] = xPrev + fraction * (x - xPrev)
+        out[lane, 8] = t - (1 - fraction) * hLane
+        out[lane, 9] = floorLane if landed and not terrain else yPrev + fraction * (y - yPrev)
+        out[lane, 10] = apex
+        out[lane, 11] = apexTime
+        out[lane, 12] = counter
+        out[lane, 13] = 1.0 if landed else 0.0
+        out[lane, 14] = vXPrev + fraction * (vX - vXPrev)
+        out[lane, 15] = vYPrev + fraction * (vY - vYPrev)
+
+
+BATCH_COLUMNS = ('t', 'x', 'y', 'vX', 'vY', 'aX', 'aY', 'range', 'flightTime', 'height', 'apex', 'apexTime', 'steps', 'landed', 'impactVX', 'impactVY')
@@ -0,0 +1,288 @@
+import numpy as np  #Math library
+import math     #python's math module
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from BatchKinematics import integrateBatch
+from Trajectory import LaunchParams
+
+INPUTS = ('theta', 'v0', 'm', 'Cd', 'A', 'rho', 'g', 'wind')   #Parameters that can be given a distribution, in sampling order
+FIELDS = ('range', 'apex', 'apexTime', 'flightTime', 'impactSpeed')   #Per-sample results that statistics are kept for
+
+
+class Normal:
+    """
+    Normal distribution with the given mean and standard deviation (e.g. a measured value and its noise).
+    """
+
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.std = std
+
+    def sample(self, rng, n):
+        return rng.normal(self.mean, self.std, n)
+
+
+class Uniform:
+    """
+    Uniform distribution between low and high.
+    """
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng, n):
+        return rng.uniform(self.low, self.high, n)
+
+
+class LogNormal:
+    """
+    Distribution whose logarithm is normal, for parameters that must stay positive (m, Cd, A, rho).
+    median is the median value and sigma the standard deviation of its logarithm.
+    """
+
+    def __init__(self, median, sigma):
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng, n):
+        return self.median * np.exp(rng.normal(0.0, self.sigma, n))
+
+
+def drawChunk(distributions, seed, index, size):
+    """
+    Draws chunk number index (size samples) of every input. Every chunk has its own random stream,
+    spawned from seed and index, so a chunk is the same no matter which worker draws it or when.
+
+    distributions maps names in INPUTS to a number (held fixed) or to anything with a
+    sample(rng, n) method, such as Normal, Uniform or LogNormal. Inputs that are left out take the
+    LaunchParams defaults (no wind).
+    """
+    rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(index,))))
+    defaults = dict(LaunchParams().__dict__, wind=0.0)
+    chunk = {}
+    for name in INPUTS:
+        value = distributions.get(name, defaults[name])
+        chunk[name] = np.asarray(value.sample(rng, size) if hasattr(value, 'sample') else np.full(size, value), dtype=float)
+    return chunk
+
+
+def runChunk(distributions, seed, index, size, tStep, maxSteps, backend='python', model=None):
+    """
+    Draws one chunk of samples and integrates it as one batch (under the DragModel.ForceModel model,
+    if given; its wind is added to the sampled wind). Returns a dict of arrays with the
+    sampled INPUTS, the results in FIELDS and landed (False for samples cut off by maxSteps).
+    """
+    chunk = drawChunk(distributions, seed, index, size)
+    result = integrateBatch(chunk['theta'], chunk['v0'], chunk['m'], chunk['rho'], chunk['A'], chunk['Cd'], chunk['g'], tStep, maxSteps, backend, wind=chunk['wind'], model=model)
+    out = dict(chunk)
+    for key in ('range', 'apex', 'apexTime', 'flightTime', 'landed'):
+        out[key] = result[key]
+    out['impactSpeed'] = np.hypot(result['impactVX'], result['impactVY'])     #At the same instant as range and flightTime
+    return out
+
+
+def samples(distributions, n, seed=0, chunkSize=100000, workers=None, tStep=0.005, maxSteps=100000, backend='python', threads=False, model=None):
+    """
+    Draws n Monte Carlo samples of the inputs, integrates them with the batch Euler integrator and
+    yields the results chunk by chunk (see runChunk), in order.
+
+    Samples are drawn inside the workers from per-chunk random streams, so nothing is sent to the
+    workers but the distributions, and the output only depends on distributions, n, seed and
+    chunkSize, never on the worker count. workers, backend, threads and model work as in
+    ParameterSweep.sweep, and at most 2 chunks per worker are in flight, so memory stays bounded for
+    any n.
+
+    Units: kg, m, sec, rad
+    """
+    starts = range(0, n, chunkSize)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for index, start in enumerate(starts):
+            yield runChunk(distributions, seed, index, min(chunkSize, n - start), tStep, maxSteps, backend, model)
+        return
+
+    poolType = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with poolType(max_workers=workers) as executor:
+        pending = deque()
+        for index, start in enumerate(starts):
+            pending.append(executor.submit(runChunk, distributions, seed, index, min(chunkSize, n - start), tStep, maxSteps, backend, model))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class StreamingHistogram:
+    """
+    Histogram with a fixed number of equal-width bins whose range grows to fit the data, so it can take
+    any number of values in constant memory.
+
+    The range starts at the extent of the first update. Whenever a value falls outside, the bin width
+    doubles (neighbouring bins are merged in pairs) until everything fits, so counts are never
+    redistributed between bins. Quantiles interpolate linearly inside a bin, so they are accurate to
+    within one bin width, which stays within a small multiple of (max - min) / bins.
+    """
+
+    def __init__(self, bins=1024):
+        if bins < 2 or bins % 2:
+            raise ValueError("bins must be an even number of at least 2")
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.low = None     #Left edge of the first bin
+        self.width = None
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        low, high = float(values.min()), float(values.max())
+        if self.low is None:
+            self.low = low
+            self.width = max(high - low, abs(low) * 1e-12, 1e-12) / self.bins * (1 + 1e-9)   #Slightly wider, so that high falls inside
+        while low < self.low or high >= self.low + self.width * self.bins:
+            merged = self.counts[0::2] + self.counts[1::2]
+            half = self.bins // 2
+            self.counts = np.zeros(self.bins, dtype=np.int64)
+            if low < self.low:      #Grow downwards: the old range becomes the upper half
+                self.counts[half:] = merged
+                self.low -= self.width * self.bins
+            else:
+                self.counts[:half] = merged
+            self.width *= 2
+        index = np.minimum(((values - self.low) / self.width).astype(np.int64), self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.count += values.size
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def edges(self):
+        return self.low + self.width * np.arange(self.bins + 1)
+
+    def quantile(self, q):
+        """
+        Returns the q-quantile (0 to 1, scalar or array) of everything seen so far.
+        """
+        q = np.asarray(q, dtype=float)
+        if self.count == 0:
+            return np.full(q.shape, math.nan)
+        cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+        rank = q * self.count
+        i = np.clip(np.searchsorted(cumulative, rank, side='left') - 1, 0, self.bins - 1)
+        inBin = np.maximum(self.counts[i], 1)
+        value = self.low + self.width * (i + np.clip((rank - cumulative[i]) / inBin, 0.0, 1.0))
+        return np.clip(value, self.min, self.max)
+
+
+class StreamingStats:
+    """
+    Running count, mean, covariance and histograms of the FIELDS of Monte Carlo results, updated one
+    chunk at a time in constant memory.
+
+    Chunk means and covariances are merged with the pairwise update of Chan et al. (each chunk is
+    centred on its own mean first), which stays accurate for any number of samples. Samples that never
+    landed are counted but left out of the statistics.
+    """
+
+    def __init__(self, fields=FIELDS, bins=1024):
+        self.fields = fields
+        self.count = 0
+        self.notLanded = 0
+        self.mean = np.zeros(len(fields))
+        self.squares = np.zeros((len(fields), len(fields)))    #Sum of outer products of deviations from the mean
+        self.histograms = {name: StreamingHistogram(bins) for name in fields}
+
+    def update(self, chunk):
+        landed = np.asarray(chunk['landed'], dtype=bool)
+        self.notLanded += int(np.count_nonzero(~landed))
+        values = np.stack([np.asarray(chunk[name], dtype=float)[landed] for name in self.fields], axis=1)
+        n = values.shape[0]
+        if n == 0:
+            return
+        mean = values.mean(axis=0)
+        deviations = values - mean
+        squares = deviations.T @ deviations
+        total = self.count + n
+        delta = mean - self.mean
+        self.squares += squares + np.outer(delta, delta) * (self.count * n / total)
+        self.mean += delta * (n / total)
+        self.count = total
+        for i, name in enumerate(self.fields):
+            self.histograms[name].update(values[:, i])
+
+    def covariance(self):
+        """
+        Returns the sample covariance matrix of the fields (in the order of self.fields).
+        """
+        if self.count < 2:
+            return np.full((len(self.fields), len(self.fields)), math.nan)
+        return self.squares / (self.count - 1)
+
+    def summary(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        Returns a dict with count, notLanded, fields, mean and std (dicts by field), covariance
+        (matrix in the order of fields), quantiles (dict by field of dicts by q) and histograms (dict
+        by field of (counts, edges)).
+        """
+        covariance = self.covariance()
+        return {
+            'count': self.count,
+            'notLanded': self.notLanded,
+            'fields': self.fields,
+            'mean': {name: float(self.mean[i]) for i, name in enumerate(self.fields)},
+            'std': {name: float(math.sqrt(covariance[i, i])) for i, name in enumerate(self.fields)},
+            'covariance': covariance,
+            'quantiles': {name: dict(zip(quantiles, self.histograms[name].quantile(quantiles).tolist())) for name in self.fields},
+            'histograms': {name: (self.histograms[name].counts.copy(), self.histograms[name].edges()) for name in self.fields},
+        }
+
+
+def monteCarlo(distributions, n, seed=0, chunkSize=100000, workers=None, tStep=0.005, maxSteps=100000, backend='python', threads=False,
+               bins=1024, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), model=None, store=None):
+    """
+    Propagates the uncertainty of the launch parameters to the impact point: draws n samples from
+    distributions (a dict from names in INPUTS to numbers or distributions such as Normal), integrates
+    them in batches (see samples) and returns StreamingStats.summary() of the results.
+
+    Only the statistics are kept, so memory does not grow with n. Results are reproducible for a given
+    seed and chunkSize. With store (a ColumnStore.ColumnStore), every sample's inputs and results are
+    also appended to it chunk by chunk, to be filtered and inspected later.
+
+    Units: kg, m, sec, rad
+    """
+    stats = StreamingStats(FIELDS, bins)
+    for chunk in samples(distributions, n, seed, chunkSize, workers, tStep, maxSteps, backend, threads, model):
+        stats.update(chunk)
+        if store is not None:
+            store.append(chunk)
+    return stats.summary(quantiles)
+
+
+def main():
+    """
+    Propagates noise in launch speed, angle, drag coefficient and wind to the range and apex.
+
+    Units: kg, m, sec, rad
+    """
+    distributions = {
+        'v0': Normal(30, 0.5),
+        'theta': Normal(math.radians(45), math.radians(1)),
+        'Cd': LogNormal(0.5, 0.05),
+        'wind': Normal(0, 2),
+    }
+    result = monteCarlo(distributions, 200000, seed=1, chunkSize=20000, tStep=0.01)
+    print("samples: " + str(result['count']) + " (" + str(result['notLanded']) + " did not land)")
+    for name in ('range', 'apex'):
+        quantiles = result['quantiles'][name]
+        print(name + ": mean " + str(result['mean'][name]) + "  std " + str(result['std'][name]) + "  5%-95%: " + str(quantiles[0.05]) + " - " + str(quantiles[0.95]))
+    print("range/apex correlation: " + str(result['covariance'][0, 1] / (result['std']['range'] * result['std']['apex'])))
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
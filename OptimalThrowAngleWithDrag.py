@@ -1,177 +1,145 @@
-# matplotlib 3.3.1
-import matplotlib.pyplot as plt
 import numpy as np
 import math
+from scipy.optimize import minimize_scalar
+from BatchKinematics import integrateBatch
+from RungeKuttaKinematics import integrateAdaptive, integrateRK4
+from Plotting import plotTrajectory
+from ColumnStore import ColumnStore
 
-def main():
+MAX_GOLDEN_STEPS = 100     #Golden-section steps of findOptimalAngleBatch; 0.618**100 * pi/2 is far below a float ulp
+
+
+def landingRange(theta, v0=30, m=1, rho=1.225, A=1, Cd=0.5, g=9.8, solver='rk45', tStep=0.01, rtol=1e-8):
+    """
+    Returns the horizontal distance at which a projectile launched at angle theta lands again.
+
+    The landing point is interpolated within the last step for every solver, so the range is a smooth
+    function of theta that an optimizer can work with:
+        'rk45':   adaptive Dormand-Prince steps (rtol), impact root-found on the continuous extension
+        'rk4':    fixed tStep RK4 steps, impact root-found on the Hermite interpolant
+        'euler':  fixed tStep Euler steps (as in main), impact linearly interpolated
+
+    Units: kg, m, sec, rad
+    """
+    if solver == 'rk45':
+        return integrateAdaptive(v0, theta, m, rho, A, Cd, g, rtol=rtol, atol=rtol*1e-2).range
+    if solver == 'rk4':
+        return integrateRK4(v0, theta, m, rho, A, Cd, g, tStep).range
+    if solver == 'euler':
+        return float(integrateBatch(theta, v0, m, rho, A, Cd, g, tStep)['range'])
+    raise ValueError("unknown solver: " + str(solver))
+
+
+def findOptimalAngle(v0=30, m=1, rho=1.225, A=1, Cd=0.5, g=9.8, tolerance=1e-5, solver='rk45', tStep=0.01, rtol=1e-8):
+    """
+    Finds the launch angle with the greatest range using Brent's method (golden-section search with
+    parabolic steps) on landingRange, which is unimodal in theta.
+
+    Needs around 10-20 trajectory evaluations for tolerance=1e-5 rad, instead of the 350 simulations
+    of the scan in main().
+
+    Returns (optimal angle in rad, maximum range in m).
+
+    Units: kg, m, sec, rad
+    """
+    result = minimize_scalar(lambda theta: -landingRange(theta, v0, m, rho, A, Cd, g, solver, tStep, rtol),
+                             bounds=(0.0, math.pi/2), method='bounded', options={'xatol': tolerance})
+    return float(result.x), float(-result.fun)
+
+
+def findOptimalAngleBatch(v0=30, m=1, rho=1.225, A=1, Cd=0.5, g=9.8, tolerance=1e-4, tStep=0.01, backend='python'):
+    """
+    Finds the optimal launch angle for many parameter sets at once with a golden-section search
+    that runs in lockstep on every lane, evaluating the candidates with BatchKinematics.integrateBatch.
+
+    Every argument may be a scalar or an array; they are broadcast against each other. The search
+    takes log(pi/2 / tolerance) / log(1.618) batch evaluations, 21 for tolerance=1e-4, and at most
+    MAX_GOLDEN_STEPS however small tolerance is (the bracket stops shrinking at the float spacing
+    anyway). backend is passed on to integrateBatch.
+
+    Returns (optimal angles in rad, maximum ranges in m) as arrays of the broadcast shape, or as
+    floats if every argument is a scalar.
+
+    Units: kg, m, sec, rad
+    """
+    v0, m, rho, A, Cd, g = np.broadcast_arrays(*[np.asarray(arg, dtype=float) for arg in (v0, m, rho, A, Cd, g)])
+    ratio = (math.sqrt(5) - 1) / 2     #Golden ratio conjugate
+
+    def evaluate(theta):
+        return integrateBatch(theta, v0, m, rho, A, Cd, g, tStep, backend=backend)['range']
+
+    low = np.zeros(v0.shape)
+    high = np.full(v0.shape, math.pi/2)
+    left = high - ratio*(high - low)
+    right = low + ratio*(high - low)
+    leftRange = evaluate(left)
+    rightRange = evaluate(right)
+    steps = min(max(math.ceil(math.log(tolerance / (math.pi/2)) / math.log(ratio)), 0), MAX_GOLDEN_STEPS)
+    for _ in range(steps):     #Every lane shrinks its bracket by the same factor
+        moveRight = leftRange < rightRange      #The maximum is right of the left candidate
+        low = np.where(moveRight, left, low)
+        high = np.where(moveRight, high, right)
+        left, right = np.where(moveRight, right, high - ratio*(high - low)), np.where(moveRight, low + ratio*(high - low), left)
+        newRange = evaluate(np.where(moveRight, right, left))
+        leftRange, rightRange = np.where(moveRight, rightRange, newRange), np.where(moveRight, newRange, leftRange)
+
+    theta = (low + high) / 2
+    maxRange = evaluate(theta)
+    if theta.ndim == 0:
+        return float(theta), float(maxRange)
+    return theta, maxRange
+
+
+def main(storePath=None):
     """
     This script takes any initial values and constants and calculates and plots the trajectory
     of an object assuming constant gravitational force and typical drag force equation.
 
     Uses the Euler method, assuming that acceleration is constant between time intervals.
+    With storePath the summary of every candidate angle is written to a ColumnStore there.
 
     Units: kg, m, sec, rad
     """
     #Drag Force Equation: 1/2 * rho * Cd * A * v^2
-    global greatestDisplacement
     greatestDisplacement = 0
-    global greatestDisplacementAngle
-    global theta
+    greatestDisplacementAngle = None
     theta = math.radians(25)
 
+    #User-Defined Constants
+    m = 1
+    v0 = 30
+    rho = 1.225     #Fluid Density
+    A = 1           #Cross-sectional Area
+    Cd = 0.5        #Drag coefficient, a ball is approx. 0.5
+    tStep = 0.01
+    g = 9.8
+
+    #Integrate all 350 candidate angles at once instead of one trajectory at a time
+    thetas = theta + 0.001 * np.arange(350)
+    result = integrateBatch(thetas, v0=v0, m=m, rho=rho, A=A, Cd=Cd, g=g, tStep=tStep)
+
+    if storePath is not None:
+        ColumnStore(storePath, 'w').append(dict(result, theta=thetas))
 
-    for i in range(350):
-
-        #User-Defined Constants
-        global m
-        global v0
-        global rho  #Fluid Density
-        global A    #Cross-sectional Area
-        global Cd   #Drag coefficient
-        global tStep
-        global g
-
-        m = 1
-        v0 = 30
-        rho = 1.225
-        A = 1
-        Cd = 0.5    #A ball is approx. 0.5
-        tStep = 0.01
-        g = 9.8
-
-
-        #Data Structures
-        global tHist
-        global xHist
-        global yHist
-        global vHist
-        global vXHist
-        global vYHist
-        global aXHist
-        global aYHist
-        tHist = []
-        xHist = []
-        yHist = []
-        vHist = []
-        vXHist = []
-        vYHist = []
-        aXHist = []
-        aYHist = []
-
-        #Create initial values
-        tHist.append(0.0)
-        xHist.append(0.0)
-        yHist.append(0.0)
-        vHist.append(v0)
-        vXHist.append(v0 * math.cos(theta))
-        vYHist.append(v0 * math.sin(theta))
-        vTheta = math.atan(vYHist[0] / vXHist[0])
-        aXHist.append(-0.5*rho*Cd*A*vHist[0]**2*math.cos(vTheta) / m)
-        aYHist.append(-g - 0.5*rho*Cd*A*vHist[0]**2*math.sin(vTheta) / m)
-        # print("t: " + str(tHist[0]))
-        # print("x: " + str(xHist[0]))
-        # print("y: " + str(yHist[0]))
-        # print("Vx: " + str(vXHist[0]))
-        # print("Vy: " + str(vYHist[0]))
-        # print("Ax: " + str(aXHist[0]))
-        # print("Ay: " + str(aYHist[0]))
-
-        counter = 1
-        #Loop until the y-displacement becomes negative (projectile reaches ground again)
-        while True:
-            tHist.append(counter * tStep)   #increment time variable
-            vXHist.append(vXHist[counter-1] + aXHist[counter-1]*tStep)
-            vYHist.append(vYHist[counter-1] + aYHist[counter-1]*tStep)
-            vHist.append(math.hypot(vXHist[counter], vYHist[counter]))
-
-            vTheta = math.atan(vYHist[counter] / vXHist[counter])
-            vSquared = vHist[counter]**2
-            xDragAccel = -0.5*rho*Cd*A*vSquared*math.cos(vTheta) / m
-            yDragAccel = -math.copysign(0.5*rho*Cd*A*vSquared*math.sin(vTheta) / m, vYHist[counter])
-
-            #This velocity calculation is incorrect; double counts cos and sin
-            # vXSquared = vXHist[counter]**2
-            # vYSquared = vYHist[counter]**2
-            # xDragAccel = -0.5*rho*Cd*A*vXSquared / m
-            # yDragAccel = -math.copysign(0.5*rho*Cd*A*vYSquared / m, vYHist[counter])
-
-            aXHist.append(xDragAccel)
-            aYHist.append(-g + yDragAccel)
-
-            tSquared = tStep**2
-            xHist.append(xHist[counter-1] + vXHist[counter]*tStep + 0.5*aXHist[counter]*tSquared)
-            yHist.append(yHist[counter-1] + vYHist[counter]*tStep + 0.5*aYHist[counter]*tSquared)
-
-            # xHist.append(xHist[counter-1] + vXHist[counter]*tStep)
-            # yHist.append(yHist[counter-1] + vYHist[counter]*tStep)
-
-            # if vYHist[counter-1] > 0.0 and vYHist[counter] < 0.0:
-            #     print("max height reached at time=" + str(tHist[counter]))
-            #
-            # print("t:  " + str(tHist[counter]))
-            # print("x:  " + str(xHist[counter]))
-            # print("y:  " + str(yHist[counter]))
-            # print("0:  " + str(vTheta))
-            # print("Vx: " + str(vXHist[counter]))
-            # print("Vy: " + str(vYHist[counter]))
-            # print("Ax: " + str(aXHist[counter]))
-            # print("Ay: " + str(aYHist[counter]))
-            # print("")
-
-            if yHist[counter] < 0 or counter > 99999:
-                break
-
-            counter += 1
-
-        if xHist[len(xHist)-1] > greatestDisplacement:
-            greatestDisplacement = xHist[len(xHist)-1]
-            greatestDisplacementAngle = theta
-        theta += 0.001
+    best = int(np.argmax(result['x']))    #Index of the first angle with the greatest displacement
+    if result['x'][best] > greatestDisplacement:
+        greatestDisplacement = result['x'][best]
+        greatestDisplacementAngle = thetas[best]
 
     print("greatestDisplacement: " + str(greatestDisplacement))
     print("greatestDisplacementAngle: " + str(greatestDisplacementAngle))
 
-    # plotData()
-
-
-def plotData():
-    print("t: " + str(tHist[len(tHist)-1]))
-    plt.plot(tHist, xHist, marker='o', markersize=2, label='x')
-    plt.plot(tHist, yHist, marker='o', markersize=2, label='y')
-    plt.grid()
-    plt.xlabel('time')
-    plt.legend()
-    plt.show()
-
-    plt.plot(xHist, yHist, marker='o', markersize=2, label='position')
-    plt.grid()
-    plt.xlabel('x')
-    plt.ylabel('y')
-    plt.show()
-
-    plt.plot(tHist, vXHist, marker='o', markersize=2, label='x velocity')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('x velocity')
-    plt.show()
-
-    plt.plot(tHist, aXHist, marker='o', markersize=2, label='x acceleration')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('x acceleration')
-    plt.show()
-
-    plt.plot(tHist, vYHist, marker='o', markersize=2, label='y velocity')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('y velocity')
-    plt.show()
-
-    plt.plot(tHist, aYHist, marker='o', markersize=2, label='y acceleration')
-    plt.grid()
-    plt.xlabel('time')
-    plt.ylabel('y acceleration')
-    plt.show()
+    #Same search with Brent's method on an interpolated landing point
+    optimalAngle, maxRange = findOptimalAngle(v0, m, rho, A, Cd, g, solver='euler', tStep=tStep)
+    print("optimalAngle: " + str(optimalAngle))
+    print("maxRange: " + str(maxRange))
+
+    # plotData(integrateEuler(v0, optimalAngle, m, rho, A, Cd, g, tStep))
+
+
+def plotData(trajectory, path=None):
+    print("t: " + str(trajectory.t[-1]))
+    plotTrajectory(trajectory, path=path)     #Every column against time, and the path; saved to path instead of shown if given
 
 
 if __name__ == "__main__":  #Run the main function
@@ -0,0 +1,162 @@
+import numpy as np  #Math library
+import math     #python's math module
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from BatchKinematics import integrateBatch
+from Trajectory import LaunchParams
+from EulerKinematics import integrateEuler
+from Plotting import decimate
+from ColumnStore import TRAJECTORY
+
+PARAMS = ('theta', 'v0', 'm', 'Cd', 'A', 'rho', 'g')    #Parameters that can be swept, in grid order
+SUMMARY = ('range', 'apex', 'apexTime', 'flightTime', 'vX', 'vY', 'steps', 'landed')     #Per-point results
+
+
+def runChunk(chunk, tStep, maxSteps, backend='python', model=None, trajectoryPoints=None):
+    """
+    Integrates one chunk of parameter sets (dict from the names in PARAMS to equal-length arrays) with
+    the batch integrator (under the DragModel.ForceModel model, if given) and returns the parameters
+    together with the per-point summaries.
+
+    With trajectoryPoints, every point is also simulated on its own with the Euler solver (same tStep
+    and maxSteps; model is not supported there) and its samples decimated to at most trajectoryPoints rows (see Plotting.decimate), which are
+    returned as a list under ColumnStore.TRAJECTORY.
+    """
+    result = integrateBatch(chunk['theta'], chunk['v0'], chunk['m'], chunk['rho'], chunk['A'], chunk['Cd'], chunk['g'], tStep, maxSteps, backend, model=model)
+    out = dict(chunk)
+    for key in SUMMARY:
+        out[key] = result[key]
+    if trajectoryPoints is not None:
+        out[TRAJECTORY] = []
+        for i in range(len(chunk['theta'])):
+            trajectory = integrateEuler(chunk['v0'][i], chunk['theta'][i], chunk['m'][i], chunk['rho'][i], chunk['A'][i], chunk['Cd'][i], chunk['g'][i], tStep, maxSteps, backend=backend)
+            keep = decimate(trajectory.x, trajectory.y, trajectoryPoints)
+            out[TRAJECTORY].append(trajectory.data[keep])
+    return out
+
+
+def gridSize(axes):
+    """
+    Returns the number of points in the Cartesian grid of axes.
+    """
+    return int(np.prod([len(axes[name]) for name in PARAMS]))
+
+
+def gridChunk(axes, start, stop):
+    """
+    Returns points start to stop of the Cartesian grid of axes (last parameter in PARAMS varying
+    fastest) without building the whole grid.
+    """
+    shape = tuple(len(axes[name]) for name in PARAMS)
+    index = np.unravel_index(np.arange(start, stop), shape)
+    return {name: np.asarray(axes[name], dtype=float)[i] for name, i in zip(PARAMS, index)}
+
+
+def listChunk(points, start, stop):
+    """
+    Returns points start to stop of a list of parameter sets (dicts or LaunchParams) as arrays.
+    """
+    defaults = LaunchParams().__dict__
+    rows = [p if isinstance(p, dict) else p.__dict__ for p in points[start:stop]]
+    return {name: np.array([row.get(name, defaults[name]) for row in rows], dtype=float) for name in PARAMS}
+
+
+def sweep(points, chunkSize=10000, workers=None, tStep=0.005, maxSteps=100000, backend='python', threads=False, model=None, store=None, trajectoryPoints=None):
+    """
+    Runs the batch Euler integrator over many parameter sets, split into chunks across a process pool,
+    and yields the results chunk by chunk in input order.
+
+    points:     either a Cartesian grid, given as a dict from parameter names (see PARAMS) to 1D arrays
+                of values, or a list of parameter sets (dicts or LaunchParams). Parameters that are left
+                out take the LaunchParams defaults.
+    chunkSize:  number of points integrated together by one worker
+    workers:    number of worker processes (default os.cpu_count()); 0 or 1 runs everything in this process
+    backend:    passed on to integrateBatch; 'numba' uses the compiled kernel when numba is installed
+    threads:    use a thread pool instead of a process pool. Only worth it with backend='numba', whose
+                kernel releases the GIL, since it avoids sending chunks between processes
+    model:      optional DragModel.ForceModel (wind profile, atmosphere, launch height, terrain) shared
+                by every point
+    store:      optional ColumnStore.ColumnStore that every chunk is appended to as it arrives, so
+                the results of sweeps too large for memory can be kept and queried later
+    trajectoryPoints:  with store, also keep every point's Euler trajectory decimated to at most this
+                many samples (simulated point by point, so much slower than the batch summaries). The
+                single-shot solver has no ForceModel, so giving both model and trajectoryPoints raises
+                ValueError rather than storing still-air trajectories next to summaries under model
+
+    Every yielded chunk is a dict of equal-length arrays with the parameters (PARAMS) and the summaries
+    (SUMMARY) of its points. The output only depends on the points and chunkSize, never on the worker
+    count or on which worker finishes first. At most 2 chunks per worker are in flight, so memory stays
+    bounded for sweeps of millions of points.
+
+    Units: kg, m, sec, rad
+    """
+    if model is not None and trajectoryPoints is not None:
+        raise ValueError("trajectoryPoints cannot be combined with model: the stored trajectories would ignore it")
+    if isinstance(points, dict):
+        defaults = LaunchParams().__dict__
+        axes = {name: np.atleast_1d(points.get(name, defaults[name])) for name in PARAMS}
+        total = gridSize(axes)
+        makeChunk = lambda start, stop: gridChunk(axes, start, stop)
+    else:
+        total = len(points)
+        makeChunk = lambda start, stop: listChunk(points, start, stop)
+    starts = range(0, total, chunkSize)
+
+    if store is None:
+        trajectoryPoints = None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for start in starts:
+            yield save(runChunk(makeChunk(start, min(start + chunkSize, total)), tStep, maxSteps, backend, model, trajectoryPoints), store)
+        return
+
+    poolType = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with poolType(max_workers=workers) as executor:
+        pending = deque()
+        for start in starts:
+            pending.append(executor.submit(runChunk, makeChunk(start, min(start + chunkSize, total)), tStep, maxSteps, backend, model, trajectoryPoints))
+            if len(pending) >= 2 * workers:
+                yield save(pending.popleft().result(), store)
+        while pending:
+            yield save(pending.popleft().result(), store)
+
+
+def save(chunk, store):
+    """
+    Appends chunk (and its trajectories, which are removed from it) to store if there is one, and
+    returns it.
+    """
+    trajectories = chunk.pop(TRAJECTORY, None)
+    if store is not None:
+        store.append(chunk, trajectories)
+    return chunk
+
+
+def collect(chunks):
+    """
+    Concatenates the chunks yielded by sweep into one dict of arrays (empty arrays of PARAMS and
+    SUMMARY if there are no chunks, e.g. for a sweep of zero points).
+    """
+    chunks = list(chunks)
+    if not chunks:
+        return {key: np.empty(0, dtype=np.int64 if key == 'steps' else bool if key == 'landed' else float) for key in PARAMS + SUMMARY}
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+
+def main():
+    """
+    Sweeps launch angle and speed on every core and prints the longest shot.
+
+    Units: kg, m, sec, rad
+    """
+    axes = {'theta': np.radians(np.linspace(5, 85, 161)), 'v0': np.linspace(10, 50, 81)}
+    result = collect(sweep(axes, chunkSize=2000))
+    best = int(np.argmax(result['range']))
+    print("points: " + str(len(result['range'])))
+    print("greatest range: " + str(result['range'][best]) + " at theta=" + str(math.degrees(result['theta'][best])) + " v0=" + str(result['v0'][best]))
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
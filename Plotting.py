@@ -0,0 +1,198 @@
+# matplotlib 3.3.1
+import numpy as np  #Math library
+import math     #python's math module
+
+#Panels of plotTrajectory: (x column, y columns). 'theta' is the angle of motion in degrees.
+DEFAULT_PANELS = (('t', ('x', 'y')), ('x', ('y',)), ('t', ('vX',)), ('t', ('aX',)), ('t', ('vY',)), ('t', ('aY',)))
+LABELS = {'t': 'time', 'x': 'x', 'y': 'y', 'vX': 'x velocity', 'vY': 'y velocity', 'aX': 'x acceleration', 'aY': 'y acceleration', 'theta': 'theta'}
+
+
+def pyplot():
+    """
+    Imports matplotlib.pyplot on first use, so that modules which only simulate never import matplotlib.
+    """
+    import matplotlib.pyplot as plt     #Plotting Library
+    return plt
+
+
+def headlessFigure(**kwargs):
+    """
+    Returns a matplotlib Figure attached to the non-interactive Agg canvas, without going through
+    pyplot, so it works without a display and does not touch pyplot's global state (and can be used
+    from several threads).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(**kwargs)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling: returns the indices of threshold points of the
+    curve (x, y) that keep its visual shape. The first and last points are always kept, and every
+    bucket of the points in between contributes the one that forms the largest triangle with the
+    previously chosen point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)    #threshold - 2 buckets between the end points
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        nextStop = edges[i + 2] if i + 2 < len(edges) else n
+        averageX = x[stop:nextStop].mean()
+        averageY = y[stop:nextStop].mean()
+        area = np.abs((x[a] - averageX) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (averageY - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def minMax(x, y, threshold):
+    """
+    Min/max downsampling: splits the curve into threshold/2 buckets and keeps the lowest and highest
+    point of each (plus the end points), so no peak is ever lost. Returns sorted indices.
+    """
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+    size = math.ceil(n / buckets)
+    padded = np.concatenate([y, np.full(buckets * size - n, y[-1])]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    indices = np.concatenate([[0, n - 1], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)])
+    return np.unique(np.minimum(indices, n - 1))
+
+
+DECIMATORS = {'lttb': lttb, 'minmax': minMax}
+
+
+def decimate(x, y, maxPoints=2000, method='lttb'):
+    """
+    Returns the indices of at most about maxPoints points of (x, y) to plot, chosen by method ('lttb',
+    'minmax' or None for every point).
+    """
+    if method is None or maxPoints is None or len(x) <= maxPoints:
+        return np.arange(len(x))
+    if method not in DECIMATORS:
+        raise ValueError("unknown decimation method: " + str(method) + " (expected one of " + ", ".join(DECIMATORS) + ")")
+    return DECIMATORS[method](np.asarray(x), np.asarray(y), maxPoints)
+
+
+def column(trajectory, name):
+    if name == 'theta':
+        return np.degrees(np.arctan(trajectory.vY / trajectory.vX))    #Angle of motion at every time step
+    return getattr(trajectory, name)
+
+
+def drawPanel(axes, trajectory, panel, maxPoints, method, markers):
+    xName, yNames = panel
+    x = column(trajectory, xName)
+    style = {'marker': 'o', 'markersize': 2} if markers else {}
+    for yName in yNames:
+        y = column(trajectory, yName)
+        keep = decimate(x, y, maxPoints, method)
+        axes.plot(x[keep], y[keep], label=LABELS[yName] if xName == 't' else 'position', **style)
+    axes.grid()
+    axes.set_xlabel(LABELS[xName])
+    if len(yNames) > 1:
+        axes.legend()
+    else:
+        axes.set_ylabel(LABELS[yNames[0]])
+
+
+def plotTrajectory(trajectory, panels=DEFAULT_PANELS, path=None, maxPoints=2000, method='lttb', dpi=100):
+    """
+    Plots a Trajectory, one panel per entry of panels, with every line decimated to at most about
+    maxPoints points (see decimate).
+
+    Without path, every panel is shown in its own window one after another, as the scripts always did.
+    With path, all panels are drawn as subplots of one figure on the Agg canvas and written to path
+    (any format matplotlib knows from the extension, e.g. .png, .svg or .pdf); nothing is shown, so
+    this works on a server without a display.
+    """
+    if path is None:
+        plt = pyplot()
+        for panel in panels:
+            drawPanel(plt.gca(), trajectory, panel, maxPoints, method, markers=True)
+            plt.show()
+        return
+
+    rows = math.ceil(len(panels) / 2)
+    figure = headlessFigure(figsize=(10, 3.2 * rows))
+    axes = figure.subplots(rows, 2, squeeze=False).ravel()
+    for ax, panel in zip(axes, panels):
+        drawPanel(ax, trajectory, panel, maxPoints, method, markers=False)
+    for ax in axes[len(panels):]:
+        figure.delaxes(ax)
+    figure.tight_layout()
+    figure.savefig(path, dpi=dpi)
+
+
+def plotSweep(trajectories, path=None, columns=('x', 'y'), values=None, valueLabel=None, maxPoints=500, method='lttb', dpi=100, cmap='viridis'):
+    """
+    Draws many trajectories (an iterable of Trajectory, e.g. a generator of simulate calls) onto shared
+    axes as a single LineCollection, which is much faster than one plot call per trajectory.
+
+    Each trajectory is decimated to at most about maxPoints points as it arrives, so only the
+    decimated lines are kept. values (one number per trajectory, such as the launch angle) colours
+    the lines through cmap and adds a colour bar labelled valueLabel. Without path the figure is shown;
+    with path it is rendered on the Agg canvas and written to path.
+    """
+    from matplotlib.collections import LineCollection
+    xName, yName = columns
+    segments = []
+    for trajectory in trajectories:
+        x = column(trajectory, xName)
+        y = column(trajectory, yName)
+        keep = decimate(x, y, maxPoints, method)
+        segments.append(np.column_stack([x[keep], y[keep]]))
+
+    lines = LineCollection(segments, linewidths=1)
+    if values is not None:
+        lines.set_array(np.asarray(values, dtype=float))
+        lines.set_cmap(cmap)
+
+    if path is None:
+        plt = pyplot()
+        figure = plt.figure()
+    else:
+        figure = headlessFigure(figsize=(8, 5))
+    axes = figure.add_subplot()
+    axes.add_collection(lines)
+    axes.autoscale()
+    axes.grid()
+    axes.set_xlabel(LABELS[xName])
+    axes.set_ylabel(LABELS[yName])
+    if values is not None:
+        figure.colorbar(lines, ax=axes, label=valueLabel)
+    if path is None:
+        plt.show()
+    else:
+        figure.savefig(path, dpi=dpi)
+
+
+def main():
+    """
+    Renders a long trajectory and a fan of launch angles to PNG files without opening a window.
+
+    Units: kg, m, sec, rad
+    """
+    from Simulation import simulate
+    trajectory = simulate(tStep=1e-4)
+    plotTrajectory(trajectory, path='trajectory.png')
+    print("trajectory.png: " + str(len(trajectory)) + " samples")
+
+    thetas = np.radians(np.arange(5, 90, 2.5))
+    plotSweep((simulate(theta=theta, tStep=1e-3) for theta in thetas), path='sweep.png', values=np.degrees(thetas), valueLabel='theta')
+    print("sweep.png: " + str(len(thetas)) + " trajectories")
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
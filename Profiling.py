@@ -0,0 +1,221 @@
+import cProfile
+import functools
+import inspect
+import json
+import marshal
+import math     #python's math module
+import pstats
+import time
+import tracemalloc
+
+PHASES = ('setup', 'integration', 'events', 'output')   #Phases every solver run is split into
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of solver runs: per-phase timers, step counts, rejected steps, derivative
+    evaluations and (optionally) peak allocation of every trajectory.
+
+    Pass it as profiler= to Simulation.simulate or to any of integrateEuler, integrateCustom,
+    integrateRK4 and integrateAdaptive. Like Tracing.StepTracer, the solvers only check for it outside
+    their inner loops (and between a step and its event checks in the RK loops), so a run without a
+    profiler costs the same as before. Each run is split into the phases in PHASES:
+
+        setup:        constants, initial state and the sample array
+        integration:  the time steps, including per-step tracer.record calls
+        events:       apex and ground impact detection (root finding for the RK solvers, the
+                      interpolation between samples for the Euler and custom solvers)
+        output:       tracer flushing and building the Trajectory
+
+    memory=True also records the peak Python and numpy allocation of each run with tracemalloc, which
+    slows the run down a lot, so it is off by default. cprofile=True runs every solver call under
+    cProfile as well, for per-function detail.
+
+    Results are in runs (one dict per trajectory) and summary(), and can be exported with toJson() and
+    dumpStats() (a file that pstats.Stats and tools like snakeviz read). A run whose solver raises is
+    aborted by the profiled decorator and left out of runs.
+    """
+
+    def __init__(self, memory=False, cprofile=False):
+        self.memory = memory
+        self.profile = cProfile.Profile() if cprofile else None
+        self.runs = []
+        self.current = None
+        self.last = 0.0
+        self.baseline = 0
+        self.startedTracing = False
+
+    def begin(self, solver, backend='python'):
+        """
+        Starts the record of one run; called by the solver as soon as it is entered. A run that was
+        left unfinished is aborted first.
+        """
+        self.abort()
+        self.current = {'solver': solver, 'backend': backend}
+        for phase in PHASES:
+            self.current[phase] = 0.0
+        if self.memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self.startedTracing = True
+            self.baseline = tracemalloc.get_traced_memory()[0]
+        if self.profile is not None:
+            self.profile.enable()
+        self.last = time.perf_counter()
+
+    def abort(self):
+        """
+        Drops the run in progress (after its solver raised): stops cProfile and, if this profiler
+        started it, tracemalloc, and records nothing. Does nothing when no run is in progress.
+        """
+        if self.current is None:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+        self.current = None
+
+    def mark(self, phase):
+        """
+        Adds the time since the previous mark (or begin) to phase.
+        """
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end(self, trajectory):
+        """
+        Finishes the record of a run (the time since the last mark counts as output) and stores the
+        step counts of its trajectory.
+        """
+        self.mark('output')
+        if self.profile is not None:
+            self.profile.disable()
+        run = self.current
+        run['total'] = sum(run[phase] for phase in PHASES)
+        run['steps'] = trajectory.steps
+        run['rejected'] = trajectory.rejected
+        run['evaluations'] = trajectory.evaluations
+        run['samples'] = len(trajectory)
+        if self.memory:
+            run['peakBytes'] = tracemalloc.get_traced_memory()[1] - self.baseline
+            if self.startedTracing:
+                tracemalloc.stop()
+                self.startedTracing = False
+        self.runs.append(run)
+        self.current = None
+
+    def summary(self):
+        """
+        Returns the runs grouped by (solver, backend): a dict from 'solver/backend' to the number of
+        runs, the total seconds of every phase, the mean steps, rejected steps and evaluations per
+        trajectory and, with memory=True, the largest peakBytes.
+        """
+        groups = {}
+        for run in self.runs:
+            key = run['solver'] + '/' + run['backend']
+            group = groups.setdefault(key, {'runs': 0, 'total': 0.0, 'steps': 0, 'rejected': 0, 'evaluations': 0, **{phase: 0.0 for phase in PHASES}})
+            group['runs'] += 1
+            for field in PHASES + ('total', 'steps', 'rejected', 'evaluations'):
+                group[field] += run[field]
+            if 'peakBytes' in run:
+                group['peakBytes'] = max(group.get('peakBytes', 0), run['peakBytes'])
+        for group in groups.values():
+            for field in ('steps', 'rejected', 'evaluations'):
+                group[field] /= group['runs']
+        return groups
+
+    def toJson(self, path=None):
+        """
+        Returns the runs and the summary as a JSON string, and also writes it to path if given.
+        """
+        text = json.dumps({'runs': self.runs, 'summary': self.summary()}, indent=2)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(text)
+        return text
+
+    def dumpStats(self, path):
+        """
+        Writes a file that pstats.Stats(path) can load. With cprofile=True that is the full cProfile
+        data; otherwise every phase of every solver appears as a function called once per run,
+        called by an entry for the solver itself, so print_stats() and print_callees() list the phases.
+        """
+        if self.profile is not None:
+            self.profile.dump_stats(path)
+            return
+        stats = {}
+        for key, group in self.summary().items():
+            runs = group['runs']
+            parent = ('Profiling', 0, key)
+            stats[parent] = (runs, runs, 0.0, group['total'], {})
+            for phase in PHASES:
+                stats[('Profiling', 0, key + ':' + phase)] = (runs, runs, group[phase], group[phase], {parent: (runs, runs, group[phase], group[phase])})
+        with open(path, 'wb') as file:
+            marshal.dump(stats, file)
+
+    def printSummary(self):
+        print("solver/backend   runs   setup(ms)  integration(ms)  events(ms)  output(ms)   steps  rejected  evaluations  peak(kB)")
+        for key, group in self.summary().items():
+            perRun = [1000 * group[phase] / group['runs'] for phase in PHASES]
+            peak = str(round(group['peakBytes'] / 1024)) if 'peakBytes' in group else '-'
+            print("%-15s %5d  %10.3f  %15.3f  %10.3f  %10.3f  %6.0f  %8.1f  %11.0f  %8s" % ((key, group['runs']) + tuple(perRun) + (group['steps'], group['rejected'], group['evaluations'], peak)))
+
+
+def profiled(solver):
+    """
+    Decorator for the solvers that take profiler=: if the solver raises between profiler.begin and
+    finish, the profiler's run is aborted (see Profiler.abort) so that cProfile and tracemalloc are
+    not left running. Costs nothing when the solver returns normally.
+    """
+    signature = inspect.signature(solver)
+
+    @functools.wraps(solver)
+    def wrapper(*args, **kwargs):
+        try:
+            return solver(*args, **kwargs)
+        except BaseException:
+            profiler = signature.bind(*args, **kwargs).arguments.get('profiler')
+            if profiler is not None:
+                profiler.abort()
+            raise
+    return wrapper
+
+
+def finish(trajectory, profiler, phase='output'):
+    """
+    Ends the profiler's record of a run, counting the time since its last mark as phase, and returns
+    trajectory. Does nothing but return trajectory when profiler is None.
+    """
+    if profiler is not None:
+        profiler.mark(phase)
+        profiler.end(trajectory)
+    return trajectory
+
+
+def main(jsonPath=None, statsPath=None):
+    """
+    Profiles every solver on the default shot, prints the per-run phase times and optionally writes
+    them as JSON and as pstats data.
+
+    Units: kg, m, sec, rad
+    """
+    from Simulation import simulate, SOLVERS
+    profiler = Profiler(memory=True)
+    for solver in SOLVERS:
+        for _ in range(3):
+            simulate(solver=solver, theta=math.radians(45), profiler=profiler)
+    profiler.printSummary()
+    if jsonPath is not None:
+        profiler.toJson(jsonPath)
+    if statsPath is not None:
+        profiler.dumpStats(statsPath)
+        pstats.Stats(statsPath).sort_stats('tottime').print_stats(8)
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
@@ -1,4 +1,354 @@
-# matplotlib 3.3.1
-import matplotlib.pyplot as plt
 import numpy as np
 import math
+from DragModel import dragConstant, derivative
+from Trajectory import Trajectory, allocate, grow
+from Profiling import finish, profiled
+from Plotting import plotTrajectory
+
+#Dormand-Prince 5(4) coefficients
+DP_C = (0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0)
+DP_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+DP_E = (-71/57600, 0.0, 71/16695, -71/1920, 17253/339200, -22/525, 1/40)    #Difference between the 5th and 4th order weights
+#Continuous extension: the state at a fraction s of the step is state + h*sum(k[i] * (P[i][0]*s + P[i][1]*s^2 + P[i][2]*s^3 + P[i][3]*s^4))
+DP_P = (
+    (1.0, -8048581381/2820520608, 8663915743/2820520608, -12715105075/11282082432),
+    (0.0, 0.0, 0.0, 0.0),
+    (0.0, 131558114200/32700410799, -68118460800/10900136933, 87487479700/32700410799),
+    (0.0, -1754552775/470086768, 14199869525/1410260304, -10690763975/1880347072),
+    (0.0, 127303824393/49829197408, -318862633887/49829197408, 701980252875/199316789632),
+    (0.0, -282668133/205662961, 2019193451/616988883, -1453857185/822651844),
+    (0.0, 40617522/29380423, -110615467/29380423, 69997945/29380423),
+)
+PANELS = (('t', ('x', 'y')), ('x', ('y',)), ('t', ('vX',)), ('t', ('vY',)))     #Plots of plotData (see Plotting.plotTrajectory)
+
+
+def dormandPrinceStep(state, f0, h, c, g):
+    """
+    Takes one Dormand-Prince step of size h from state (x, y, vX, vY) whose derivative is f0.
+
+    Returns the new state, the embedded error estimate and the seven stage derivatives (the last one
+    is the derivative at the new state, so it can be reused as f0 for the next step).
+    """
+    k = [f0]
+    for i in range(1, 7):
+        a = DP_A[i]
+        stage = tuple(state[j] + h*sum(a[l]*k[l][j] for l in range(i)) for j in range(4))
+        k.append(derivative(stage, c, g))
+    error = tuple(h*sum(DP_E[l]*k[l][j] for l in range(7)) for j in range(4))
+    return stage, error, k
+
+
+def denseState(state, k, h, s):
+    """
+    Evaluates the Dormand-Prince continuous extension at a fraction s (0 to 1) of the step that produced k.
+    """
+    b = [P[0]*s + P[1]*s**2 + P[2]*s**3 + P[3]*s**4 for P in DP_P]
+    return tuple(state[j] + h*sum(b[l]*k[l][j] for l in range(7)) for j in range(4))
+
+
+def hermiteState(state0, f0, state1, f1, h, s):
+    """
+    Evaluates the cubic Hermite interpolant between two states (and their derivatives f0 and f1) a
+    step h apart, at a fraction s (0 to 1) of the step.
+    """
+    h00 = (1 + 2*s) * (1 - s)**2
+    h10 = s * (1 - s)**2
+    h01 = s*s * (3 - 2*s)
+    h11 = s*s * (s - 1)
+    return tuple(h00*state0[j] + h*h10*f0[j] + h01*state1[j] + h*h11*f1[j] for j in range(4))
+
+
+def findEvent(evaluate, component, tolerance=1e-13, start=0.0):
+    """
+    Finds the fraction s of a step at which the given state component crosses zero, using the
+    Illinois (modified regula falsi) method on an interpolant evaluate(s) of the step.
+
+    The component must be positive at fraction start of the step and not positive at the end.
+    """
+    sLow, fLow = start, evaluate(start)[component]
+    sHigh, fHigh = 1.0, evaluate(1.0)[component]
+    side = 0
+    for i in range(100):
+        s = (sLow*fHigh - sHigh*fLow) / (fHigh - fLow)
+        f = evaluate(s)[component]
+        if f > 0:
+            sLow, fLow = s, f
+            if side == -1:
+                fHigh *= 0.5
+            side = -1
+        else:
+            sHigh, fHigh = s, f
+            if side == 1:
+                fLow *= 0.5
+            side = 1
+        if sHigh - sLow < tolerance or f == 0:
+            break
+    return s
+
+
+def rungeKuttaStep(state, f0, h, c, g):
+    """
+    Takes one classic 4th order Runge-Kutta step of size h from state (x, y, vX, vY) whose derivative is f0.
+    """
+    k2 = derivative(tuple(state[j] + 0.5*h*f0[j] for j in range(4)), c, g)
+    k3 = derivative(tuple(state[j] + 0.5*h*k2[j] for j in range(4)), c, g)
+    k4 = derivative(tuple(state[j] + h*k3[j] for j in range(4)), c, g)
+    return tuple(state[j] + h/6 * (f0[j] + 2*k2[j] + 2*k3[j] + k4[j]) for j in range(4))
+
+
+@profiled
+def integrateRK4(v0, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tStep=0.05, maxSteps=100000, tracer=None, profiler=None):
+    """
+    Integrates a trajectory with fixed-size classic Runge-Kutta (RK4) steps until it hits the ground,
+    and returns it as a Trajectory.
+
+    The apex and the ground impact are found on the cubic Hermite interpolant of the step they
+    occur in, so the last sample is exactly on the ground rather than the first one below it.
+    If a tracer (Tracing.StepTracer) is given, every sample is recorded to it, and a
+    Profiling.Profiler passed as profiler times the setup, integration, events and output phases.
+
+    Units: kg, m, sec, rad
+    """
+    if profiler is not None:
+        profiler.begin('rk4')
+    c = dragConstant(rho, Cd, A, m)
+    h = tStep
+    state = (0.0, 0.0, v0*math.cos(theta), v0*math.sin(theta))
+    f0 = derivative(state, c, g)
+    evaluations = 1
+
+    data = allocate(v0, theta, g, tStep, maxSteps)     #Rows of t, x, y, vX, vY, aX, aY
+    data[0] = (0.0,) + state + f0[2:]
+    if tracer is not None:
+        tracer.record(data[0])
+    apex = None
+    impact = None
+    counter = 1
+    if profiler is not None:
+        profiler.mark('setup')
+
+    #Loop until the projectile reaches the ground again
+    while impact is None and counter <= maxSteps:
+        newState = rungeKuttaStep(state, f0, h, c, g)
+        f1 = derivative(newState, c, g)
+        evaluations += 4
+        t = (counter - 1) * h
+        evaluate = lambda s: hermiteState(state, f0, newState, f1, h, s)
+        if profiler is not None:
+            profiler.mark('integration')
+
+        top = 0.0   #Fraction of the step at which the projectile is highest, if that is inside the step
+        if apex is None and state[3] > 0.0 and newState[3] <= 0.0:     #Max height is reached inside this step
+            top = findEvent(evaluate, 3)
+            apex = (t + top*h,) + evaluate(top)
+
+        if newState[1] < 0.0 and newState[3] < 0.0:     #The projectile reaches the ground inside this step
+            s = findEvent(evaluate, 1, start=top)   #After the apex, in case the whole flight fits in this step
+            landing = evaluate(s)
+            newState = (landing[0], 0.0, landing[2], landing[3])
+            f1 = derivative(newState, c, g)
+            evaluations += 1
+            impact = (t + s*h,) + newState
+        if profiler is not None:
+            profiler.mark('events')
+
+        if counter == data.shape[0]:
+            data = grow(data)
+        data[counter] = (impact[0] if impact else counter * h,) + newState + f1[2:]
+        if tracer is not None:
+            tracer.record(data[counter])
+        state = newState
+        f0 = f1
+        counter += 1
+
+    if profiler is not None:
+        profiler.mark('integration')
+    if tracer is not None:
+        tracer.flush()
+    return finish(Trajectory(data[:counter], counter - 1, evaluations, apex=apex, impact=impact), profiler)
+
+
+@profiled
+def integrateAdaptive(v0, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, rtol=1e-8, atol=1e-10, maxSteps=100000, tracer=None, stopX=None, floor=0.0, profiler=None):
+    """
+    Integrates a trajectory with adaptive Dormand-Prince (RK45) steps until it hits the ground, and
+    returns it as a Trajectory.
+
+    The step size is chosen from the embedded 4th order error estimate so that the local error stays
+    below atol + rtol*|state|. Instead of stopping at the first sample below ground, the ground impact
+    (y = 0 going down) and the apex (vY = 0 going down) are root-found on the continuous extension of
+    the step they occur in, so the last sample is exactly on the ground. If a tracer
+    (Tracing.StepTracer) is given, every accepted sample is recorded to it. A Profiling.Profiler
+    passed as profiler times the setup, integration, events and output phases.
+
+    floor:  height of the ground relative to the launch point (negative for a shot fired downhill)
+    stopX:  if given, the run also ends where x reaches stopX (found the same way). range and
+            flightTime then describe that point and trajectory.y[-1] is the height there, which is
+            what Targeting uses to aim at a point.
+
+    Units: kg, m, sec, rad
+    """
+    if profiler is not None:
+        profiler.begin('rk45')
+    c = dragConstant(rho, Cd, A, m)
+    t = 0.0
+    state = (0.0, 0.0, v0*math.cos(theta), v0*math.sin(theta))
+    f0 = derivative(state, c, g)
+    evaluations = 1
+
+    #Initial step size: the time it takes for the velocity to change by rtol^(1/5) of itself. A shot
+    #dropped from rest has no velocity to compare with, so the speed gained in 1 sec of free fall is
+    #used instead (a zero step would never grow)
+    speed = v0 if v0 > 0 else g * 1.0
+    h = rtol**0.2 * speed / math.hypot(f0[2], f0[3])
+
+    data = np.empty((64, 7))    #Rows of t, x, y, vX, vY, aX, aY, doubled whenever it fills up
+    stages = np.empty((64, 7, 4))   #Stage derivatives of every accepted step, for the continuous extension
+    fullSteps = np.empty(64)        #Size of every accepted step before it was cut short at an event
+    data[0] = (t,) + state + f0[2:]
+    if tracer is not None:
+        tracer.record(data[0])
+    apex = None
+    impact = None
+    steps = 0
+    rejected = 0
+    if profiler is not None:
+        profiler.mark('setup')
+
+    while impact is None and steps < maxSteps:
+        newState, error, k = dormandPrinceStep(state, f0, h, c, g)
+        evaluations += 6
+        errorNorm = math.sqrt(sum((error[j] / (atol + rtol*max(abs(state[j]), abs(newState[j]))))**2 for j in range(4)) / 4)
+
+        if errorNorm > 1.0:     #Reject the step and try again with a smaller one
+            h *= max(0.2, 0.9 * errorNorm**-0.2)
+            rejected += 1
+            continue
+
+        steps += 1
+        if steps > stages.shape[0]:
+            stages, fullSteps = grow(stages), grow(fullSteps)
+        stages[steps-1] = k
+        fullSteps[steps-1] = h
+        f0 = k[6]
+        evaluate = lambda s: denseState(state, k, h, s)
+        if profiler is not None:
+            profiler.mark('integration')
+        top = None     #Fraction of the step at which the projectile is highest, if that is inside the step
+        if apex is None and state[3] > 0.0 and newState[3] <= 0.0:     #Max height is reached inside this step
+            top = findEvent(evaluate, 3)
+
+        end = None     #Fraction of the step at which the run ends, if it ends inside this step
+        landed = False
+        if newState[1] < floor and newState[3] < 0.0:     #The projectile reaches the ground inside this step
+            end = findEvent(lambda s: (0.0, evaluate(s)[1] - floor), 1, start=top or 0.0)    #After the apex, in case the whole flight fits in this step
+            landed = True
+        if stopX is not None and newState[0] >= stopX:      #The projectile reaches stopX inside this step
+            s = findEvent(lambda s: (stopX - evaluate(s)[0],), 0)
+            if end is None or s < end:
+                end = s
+                landed = False
+
+        if top is not None and (end is None or top <= end):
+            apex = (t + top*h,) + evaluate(top)
+
+        if end is not None:
+            newState = evaluate(end)
+            if landed:
+                newState = (newState[0], floor, newState[2], newState[3])
+            else:
+                newState = (stopX, newState[1], newState[2], newState[3])
+            f0 = derivative(newState, c, g)
+            evaluations += 1
+            h *= end
+            impact = (t + h,) + newState
+        if profiler is not None:
+            profiler.mark('events')
+
+        t += h
+        state = newState
+        if steps == data.shape[0]:
+            data = grow(data)
+        data[steps] = (t,) + state + f0[2:]
+        if tracer is not None:
+            tracer.record(data[steps])
+
+        h *= min(5.0, max(0.2, 0.9 * errorNorm**-0.2)) if errorNorm > 0 else 5.0
+
+    if profiler is not None:
+        profiler.mark('integration')
+    if tracer is not None:
+        tracer.flush()
+    coefficients = np.einsum('lp,nlj->npj', np.array(DP_P), stages[:steps])     #Continuous extension polynomial of every step
+    return finish(Trajectory(data[:steps+1], steps, evaluations, rejected, apex=apex, impact=impact, dense=(coefficients, fullSteps[:steps])), profiler)
+
+
+def compareSolvers(v0=30, theta=math.radians(45), m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8):
+    """
+    Prints how many steps the Euler, custom, RK4 and adaptive RK45 solvers need for a given range and
+    apex accuracy, measured against an adaptive RK45 reference run at rtol=1e-13.
+
+    The Euler path is the one used by EulerKinematics and BatchKinematics, whose range is the x of the
+    first sample below ground.
+    """
+    from BatchKinematics import integrateBatch
+    from CustomKinematics import integrateCustom
+
+    reference = integrateAdaptive(v0, theta, m, rho, A, Cd, g, rtol=1e-13, atol=1e-13)
+
+    print("solver  setting        steps  evaluations  range error  apex error")
+    for tStep in (0.05, 0.01, 0.005, 0.001, 0.0001):
+        result = integrateBatch(theta, v0, m, rho, A, Cd, g, tStep)
+        steps = int(result['steps'])
+        print("euler   tStep=%-7g %7d  %11d  %11.2e  %10.2e" % (tStep, steps, steps, abs(result['x'] - reference.range), abs(result['apex'] - reference.apex)))
+    for tStep in (0.1, 0.05, 0.01, 0.005):
+        result = integrateCustom(v0, theta, m, rho, A, Cd, g, tStep)
+        print("custom  tStep=%-7g %7d  %11d  %11.2e  %10.2e" % (tStep, result.steps, result.evaluations, abs(result.range - reference.range), abs(result.apex - reference.apex)))
+    for tStep in (0.2, 0.1, 0.05, 0.01):
+        result = integrateRK4(v0, theta, m, rho, A, Cd, g, tStep)
+        print("rk4     tStep=%-7g %7d  %11d  %11.2e  %10.2e" % (tStep, result.steps, result.evaluations, abs(result.range - reference.range), abs(result.apex - reference.apex)))
+    for rtol in (1e-4, 1e-6, 1e-8, 1e-10):
+        result = integrateAdaptive(v0, theta, m, rho, A, Cd, g, rtol=rtol, atol=rtol*1e-2)
+        print("rk45    rtol=%-8g %7d  %11d  %11.2e  %10.2e" % (rtol, result.steps, result.evaluations, abs(result.range - reference.range), abs(result.apex - reference.apex)))
+
+
+def main(plotPath=None):
+    """
+    This script takes any initial values and constants and calculates and plots the trajectory
+    of an object assuming constant gravitational force and typical drag force equation.
+
+    Uses adaptive Dormand-Prince (RK45) steps, and finds the apex and ground impact exactly.
+    With plotPath the plots are written to that file instead of shown (see Plotting.plotTrajectory).
+
+    Units: kg, m, sec, rad
+    """
+    m = 1
+    v0 = 30
+    theta = math.radians(45)
+    rho = 1.225     #Fluid Density
+    A = 0.05        #Cross-sectional Area
+    Cd = 0.5        #Drag coefficient, a ball is approx. 0.5
+    g = 9.8
+
+    trajectory = integrateAdaptive(v0, theta, m, rho, A, Cd, g)
+    print("max height: " + str(trajectory.apex) + " reached at time=" + str(trajectory.apexTime))
+    print("range: " + str(trajectory.range) + " reached at time=" + str(trajectory.flightTime))
+    print("steps: " + str(trajectory.steps) + " (" + str(trajectory.rejected) + " rejected)")
+
+    plotData(trajectory, plotPath)
+
+
+def plotData(trajectory, path=None):
+    plotTrajectory(trajectory, PANELS, path)
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
@@ -0,0 +1,104 @@
+import math     #python's math module
+from Trajectory import LaunchParams
+
+SOLVERS = ('euler', 'custom', 'rk4', 'rk45')
+
+
+def simulate(params=None, solver='euler', rtol=1e-8, tracer=None, backend='python', profiler=None, **overrides):
+    """
+    Simulates one shot and returns it as a Trajectory.
+
+    params:     LaunchParams (or a dict of its fields); any keyword in overrides replaces a field, so
+                simulate(v0=40) works without building params first
+    solver:     'euler'  (EulerKinematics, fixed tStep)
+                'custom' (CustomKinematics separation of variables, fixed tStep)
+                'rk4'    (RungeKuttaKinematics, fixed tStep)
+                'rk45'   (RungeKuttaKinematics, adaptive steps with tolerance rtol)
+    tracer:     optional Tracing.StepTracer that receives every step in batches (off by default)
+    backend:    'numba' or 'auto' run the euler and custom loops as compiled JitKernels when numba is
+                installed; 'python' (and any machine without numba) uses the reference loops
+    profiler:   optional Profiling.Profiler that records phase times and step counts (off by default)
+
+    Nothing is kept in module globals, so this can be called from several threads at once.
+
+    Units: kg, m, sec, rad
+    """
+    if params is None:
+        params = LaunchParams()
+    elif isinstance(params, dict):
+        params = LaunchParams(**params)
+    if overrides:
+        params = LaunchParams(**{**params.__dict__, **overrides})
+    p = params
+
+    #Imported here so that picking one solver does not import the others (CustomKinematics pulls in sympy)
+    if solver == 'euler':
+        from EulerKinematics import integrateEuler
+        return integrateEuler(p.v0, p.theta, p.m, p.rho, p.A, p.Cd, p.g, p.tStep, tracer=tracer, backend=backend, profiler=profiler)
+    if solver == 'custom':
+        from CustomKinematics import integrateCustom
+        return integrateCustom(p.v0, p.theta, p.m, p.rho, p.A, p.Cd, p.g, p.tStep, tracer=tracer, backend=backend, profiler=profiler)
+    if solver == 'rk4':
+        from RungeKuttaKinematics import integrateRK4
+        return integrateRK4(p.v0, p.theta, p.m, p.rho, p.A, p.Cd, p.g, p.tStep, tracer=tracer, profiler=profiler)
+    if solver == 'rk45':
+        from RungeKuttaKinematics import integrateAdaptive
+        return integrateAdaptive(p.v0, p.theta, p.m, p.rho, p.A, p.Cd, p.g, rtol=rtol, atol=rtol*1e-2, tracer=tracer, profiler=profiler)
+    raise ValueError("unknown solver: " + str(solver) + " (expected one of " + ", ".join(SOLVERS) + ")")
+
+
+def stream(params=None, solver='euler', every=1, blockSize=None, maxSteps=100000, **overrides):
+    """
+    Simulates one shot and yields its samples as they are computed instead of storing them, so memory
+    does not grow with the flight time divided by tStep.
+
+    params, overrides:  as for simulate
+    solver:     'euler' or 'custom' (the fixed-step solvers, which are the ones run at very small tStep)
+    every:      yield only every every-th sample (the last sample is always yielded)
+    blockSize:  if given, yield (blockSize, 7) arrays of samples instead of single (t, x, y, vX, vY,
+                aX, aY) tuples
+
+    Streaming.summarize(stream(...)) gives range, apex and impact speed in constant memory, with or
+    without every (decimation always keeps the samples the summary depends on).
+
+    Units: kg, m, sec, rad
+    """
+    from Streaming import decimate, blocks
+    if params is None:
+        params = LaunchParams()
+    elif isinstance(params, dict):
+        params = LaunchParams(**params)
+    if overrides:
+        params = LaunchParams(**{**params.__dict__, **overrides})
+    p = params
+
+    if solver == 'euler':
+        from EulerKinematics import streamEuler
+        samples = streamEuler(p.v0, p.theta, p.m, p.rho, p.A, p.Cd, p.g, p.tStep, maxSteps)
+    elif solver == 'custom':
+        from CustomKinematics import streamCustom
+        samples = streamCustom(p.v0, p.theta, p.m, p.rho, p.A, p.Cd, p.g, p.tStep, maxSteps)
+    else:
+        raise ValueError("unknown streaming solver: " + str(solver) + " (expected euler or custom)")
+    if every > 1:
+        samples = decimate(samples, every)
+    if blockSize is not None:
+        samples = blocks(samples, blockSize)
+    return samples
+
+
+def main():
+    """
+    Simulates the default shot with every solver and prints the summaries.
+
+    Units: kg, m, sec, rad
+    """
+    params = LaunchParams(v0=30, theta=math.radians(45))
+    for solver in SOLVERS:
+        trajectory = simulate(params, solver=solver)
+        print(solver + ": range " + str(trajectory.range) + "  apex " + str(trajectory.apex) + "  flight time " + str(trajectory.flightTime)
+              + "  impact speed " + str(trajectory.impactSpeed) + "  samples " + str(len(trajectory)))
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from DragModel import dragConstant
+from Simulation import simulate
+from Trajectory import LaunchParams
+
+VERSION = 1     #Bump when a solver changes so old trajectories on disk are not reused
+
+
+def normalize(value):
+    """
+    Rounds a float to 12 significant digits, so that parameters computed in a different order (e.g.
+    the same drag constant from a different m, A, Cd and rho) give the same key.
+    """
+    return float('%.12g' % value)
+
+
+class SimulationCache:
+    """
+    Bounded least-recently-used cache of simulated trajectories, in front of Simulation.simulate.
+
+    Shots are keyed on what the motion actually depends on: the drag constant k = rho*Cd*A/(2m),
+    v0, theta, g, the solver and its step size (tStep, or rtol for RK45). Physically equivalent
+    shots, such as a heavier ball with a proportionally larger cross-section, share one entry.
+
+    The in-memory tier holds at most maxEntries trajectories and maxBytes of sample arrays, evicting
+    the least recently used ones first. With cacheDir, every computed trajectory is also pickled to
+    disk and looked up there before simulating, so the cache survives restarts (the disk tier is not
+    bounded). The hits, diskHits, misses and evictions counters (see stats()) show how well it works.
+
+    The returned trajectories are shared between callers, so their arrays are made read-only. Calls
+    with a tracer always simulate, since the tracer has to see every step. All methods are thread-safe.
+    """
+
+    def __init__(self, maxEntries=1024, maxBytes=64 * 2**20, cacheDir=None):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.cacheDir = cacheDir
+        self.entries = OrderedDict()    #Key: (trajectory, size in bytes), least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(params, solver='euler', rtol=1e-8):
+        """
+        Returns the cache key of a shot: (solver, k, v0, theta, g, step setting), normalized.
+        """
+        setting = rtol if solver == 'rk45' else params.tStep
+        return (solver,) + tuple(normalize(value) for value in (dragConstant(params.rho, params.Cd, params.A, params.m), params.v0, params.theta, params.g, setting))
+
+    def simulate(self, params=None, solver='euler', rtol=1e-8, tracer=None, backend='python', **overrides):
+        """
+        Same as Simulation.simulate, but returns the cached trajectory if an equivalent shot was
+        simulated before.
+
+        Units: kg, m, sec, rad
+        """
+        if params is None:
+            params = LaunchParams()
+        elif isinstance(params, dict):
+            params = LaunchParams(**params)
+        if overrides:
+            params = LaunchParams(**{**params.__dict__, **overrides})
+        if tracer is not None:
+            return simulate(params, solver, rtol, tracer, backend)
+
+        key = self.key(params, solver, rtol)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        trajectory = self.loadFile(key)
+        if trajectory is None:
+            trajectory = simulate(params, solver, rtol, backend=backend)
+            self.saveFile(key, trajectory)
+            with self.lock:
+                self.misses += 1
+        else:
+            with self.lock:
+                self.diskHits += 1
+        self.put(key, trajectory)
+        return trajectory
+
+    def put(self, key, trajectory):
+        """
+        Stores a trajectory under key (read-only from now on), evicting old entries to stay in bounds.
+        """
+        arrays = [trajectory.data] + list(trajectory.dense or ())
+        for array in arrays:
+            array.flags.writeable = False
+        size = sum(array.nbytes for array in arrays)
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (trajectory, size)
+            self.bytes += size
+            while len(self.entries) > self.maxEntries or (self.bytes > self.maxBytes and len(self.entries) > 1):
+                self.bytes -= self.entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def path(self, key):
+        name = hashlib.sha1(repr((VERSION,) + key).encode()).hexdigest()[:20]
+        return os.path.join(self.cacheDir, name + '.pickle')
+
+    def loadFile(self, key):
+        """
+        Returns the trajectory stored on disk under key, or None.
+        """
+        if self.cacheDir is None:
+            return None
+        try:
+            with open(self.path(key), 'rb') as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def saveFile(self, key, trajectory):
+        if self.cacheDir is None:
+            return
+        os.makedirs(self.cacheDir, exist_ok=True)
+        path = self.path(key)
+        #Write under a temporary name first so a crash never leaves a half-written file behind
+        temporary = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(trajectory, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def clear(self):
+        """
+        Empties the in-memory tier (the disk tier and the counters are kept).
+        """
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Returns the counters and the current size as a dict.
+        """
+        with self.lock:
+            lookups = self.hits + self.diskHits + self.misses
+            return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'diskHits': self.diskHits,
+                    'misses': self.misses, 'evictions': self.evictions, 'hitRate': (self.hits + self.diskHits) / lookups if lookups else 0.0}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def main():
+    """
+    Simulates a few shots twice through a small cache and prints the counters.
+
+    Units: kg, m, sec, rad
+    """
+    cache = SimulationCache(maxEntries=4)
+    for _ in range(2):
+        for v0 in (20, 30, 40):
+            trajectory = cache.simulate(v0=v0)
+            print("v0: " + str(v0) + "  range: " + str(trajectory.range))
+    #Twice the mass and twice the area: the same drag constant, so the same entry
+    print("equivalent shot range: " + str(cache.simulate(v0=30, m=2, A=0.1).range))
+    print(cache.stats())
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
@@ -0,0 +1,391 @@
+import numpy as np  #Math library
+import math     #python's math module
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from BatchKinematics import integrateBatch
+from OptimalThrowAngleWithDrag import findOptimalAngleBatch
+from Targeting import targetAnglesBatch
+from MonteCarlo import StreamingHistogram
+from Trajectory import LaunchParams
+
+SHOT = ('v0', 'm', 'rho', 'A', 'Cd', 'g')     #Launch parameters every endpoint takes
+MAX_BODY = 2**20    #Largest request body accepted, in bytes
+POSITIVE = ('v0', 'm', 'g')     #Launch parameters that must be > 0 (rho, A and Cd may also be 0)
+MIN_TOLERANCE = 1e-12   #Smallest tolerance accepted, in rad
+MIN_TSTEP = 1e-4    #Smallest time step accepted, in sec
+MAX_STEPS = 10**6   #Largest maxSteps accepted
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def simulateBatch(columns, settings, backend):
+    """
+    Integrates the shots of a batch of /simulate requests and returns the summary lists of every lane.
+    """
+    result = integrateBatch(columns['theta'], columns['v0'], columns['m'], columns['rho'], columns['A'], columns['Cd'], columns['g'], settings['tStep'], int(settings['maxSteps']), backend)
+    return {key: result[key].tolist() for key in ('range', 'apex', 'apexTime', 'flightTime', 'vX', 'vY', 'steps', 'landed')}
+
+
+def optimalAngleBatch(columns, settings, backend):
+    """
+    Finds the optimal angle of every request in a batch of /optimal-angle requests.
+    """
+    theta, maxRange = findOptimalAngleBatch(columns['v0'], columns['m'], columns['rho'], columns['A'], columns['Cd'], columns['g'], settings['tolerance'], settings['tStep'], backend)
+    return {'theta': theta.tolist(), 'range': maxRange.tolist()}
+
+
+def targetBatch(columns, settings, backend):
+    """
+    Finds the low and high angles of every request in a batch of /target requests (None if out of reach).
+    """
+    low, high = targetAnglesBatch(columns['x'], columns['y'], columns['v0'], columns['m'], columns['rho'], columns['A'], columns['Cd'], columns['g'],
+                                  tolerance=settings['tolerance'], tStep=settings['tStep'], backend=backend)
+    return {'low': [None if math.isnan(angle) else angle for angle in low.tolist()], 'high': [None if math.isnan(angle) else angle for angle in high.tolist()]}
+
+
+#Endpoint name: (per-request inputs, batch settings with their defaults, batch function). Requests are
+#only batched together with requests of the same endpoint and settings.
+ENDPOINTS = {
+    'simulate': (('theta',) + SHOT, {'tStep': 0.005, 'maxSteps': 100000}, simulateBatch),
+    'optimal-angle': (SHOT, {'tStep': 0.01, 'tolerance': 1e-4}, optimalAngleBatch),
+    'target': (('x', 'y') + SHOT, {'tStep': 0.01, 'tolerance': 1e-6}, targetBatch),
+}
+
+
+class Overloaded(Exception):
+    """
+    Raised (and answered with 503) when a request arrives while maxPending requests are unanswered.
+    """
+
+
+def parse(endpoint, payload):
+    """
+    Checks the JSON payload of one request and returns (inputs, settings) as tuples in the order of
+    ENDPOINTS[endpoint], with the LaunchParams defaults for inputs that are left out.
+    """
+    fields, defaults, _ = ENDPOINTS[endpoint]
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    unknown = set(payload) - set(fields) - set(defaults)
+    if unknown:
+        raise ValueError("unknown fields: " + ", ".join(sorted(unknown)) + " (expected " + ", ".join(fields + tuple(defaults)) + ")")
+    for name, value in payload.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(name + " must be a finite number")
+    launch = LaunchParams().__dict__
+    missing = [name for name in fields if name not in payload and name not in launch]
+    if missing:
+        raise ValueError(endpoint + " needs " + ", ".join(missing))
+    inputs = tuple(float(payload.get(name, launch.get(name))) for name in fields)
+    settings = tuple(float(payload.get(name, default)) for name, default in defaults.items())
+    for name, value in zip(fields, inputs):
+        if name in SHOT and (value < 0 or (value == 0 and name in POSITIVE)):
+            raise ValueError(name + " must be " + ("positive" if name in POSITIVE else "at least 0"))
+    #Limits that keep every batch finite: the searches run until tolerance and every shot for up to maxSteps steps of tStep
+    limits = dict(zip(defaults, settings))
+    if limits['tStep'] < MIN_TSTEP:
+        raise ValueError("tStep must be at least " + str(MIN_TSTEP))
+    if limits.get('tolerance', MIN_TOLERANCE) < MIN_TOLERANCE:
+        raise ValueError("tolerance must be at least " + str(MIN_TOLERANCE))
+    if not 1 <= limits.get('maxSteps', 1) <= MAX_STEPS:
+        raise ValueError("maxSteps must be between 1 and " + str(MAX_STEPS))
+    if endpoint == 'target' and payload['x'] <= 0:
+        raise ValueError("the target must be in front of the launch point (x > 0)")
+    return inputs, settings
+
+
+class SimulationServer:
+    """
+    asyncio server that answers simulate, optimal-angle and target queries over HTTP, on TCP or a
+    Unix socket, by coalescing concurrent requests into vectorized batch calls.
+
+    Requests for the same endpoint and settings that arrive within window seconds of each other (or
+    until maxBatch have gathered) are answered together with one call of BatchKinematics.integrateBatch,
+    OptimalThrowAngleWithDrag.findOptimalAngleBatch or Targeting.targetAnglesBatch, so the Python
+    overhead of a solve is paid once per batch instead of once per request. Batches run on a pool of
+    workers processes (threads=True for threads, the better choice with backend='numba', whose kernel
+    releases the GIL), at most workers at a time; requests that arrive meanwhile form the next batches.
+
+    Backpressure: once maxPending requests are waiting or running, new ones are refused with 503
+    instead of queueing without bound.
+
+    HTTP API (JSON bodies, keep-alive connections):
+        POST /simulate       {theta, v0, m, rho, A, Cd, g, tStep, maxSteps}  ->  range, apex, apexTime,
+                             flightTime, vX, vY, steps, landed of an Euler shot
+        POST /optimal-angle  {v0, m, rho, A, Cd, g, tStep, tolerance}  ->  theta, range
+        POST /target         {x, y, v0, m, rho, A, Cd, g, tStep, tolerance}  ->  low, high (null if
+                             out of reach)
+        GET  /stats          request and batch counts and latency histograms of every endpoint
+    Fields that are left out take the LaunchParams defaults. A POST body may also be a list of
+    requests, which is answered with the list of their results, or refused as a whole. v0, m and g
+    must be positive and rho, A and Cd at least 0; tStep, tolerance and maxSteps are held to MIN_TSTEP,
+    MIN_TOLERANCE and MAX_STEPS so that no request can occupy a worker for long.
+
+    Units: kg, m, sec, rad
+    """
+
+    def __init__(self, window=0.002, maxBatch=4096, maxPending=10000, workers=None, threads=False, backend='python'):
+        self.window = window
+        self.maxBatch = maxBatch
+        self.maxPending = maxPending
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.backend = backend
+        self.executor = None
+        self.slots = None
+        self.groups = {}    #(endpoint, settings): list of (inputs, future, arrival time) still gathering
+        self.tasks = set()
+        self.pending = 0    #Requests accepted but not answered yet
+        self.rejected = 0
+        self.requests = {name: 0 for name in ENDPOINTS}
+        self.batches = {name: 0 for name in ENDPOINTS}
+        self.latencySum = {name: 0.0 for name in ENDPOINTS}
+        self.latency = {name: StreamingHistogram(128) for name in ENDPOINTS}     #Milliseconds from arrival to result
+
+    def start(self):
+        if self.executor is None:
+            poolType = ThreadPoolExecutor if self.threads else ProcessPoolExecutor
+            self.executor = poolType(max_workers=self.workers)
+            self.slots = asyncio.Semaphore(self.workers)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def submit(self, endpoint, payload):
+        """
+        Answers one request (a dict of inputs and settings, see parse) once its batch has run, and
+        returns the result as a dict. Raises ValueError for a bad payload and Overloaded when
+        maxPending requests are already unanswered.
+        """
+        inputs, settings = parse(endpoint, payload)
+        self.admit(1)
+        return await self.enqueue(endpoint, inputs, settings)
+
+    async def submitMany(self, endpoint, payloads):
+        """
+        Answers a list of requests and returns the list of their results. Every request is parsed and
+        the whole list is admitted against maxPending before any of them is queued, so a bad or
+        refused list leaves nothing behind.
+        """
+        parsed = []
+        for index, payload in enumerate(payloads):
+            try:
+                parsed.append(parse(endpoint, payload))
+            except ValueError as error:
+                raise ValueError("request " + str(index) + ": " + str(error)) from None
+        self.admit(len(parsed))
+        return list(await asyncio.gather(*[self.enqueue(endpoint, inputs, settings) for inputs, settings in parsed]))
+
+    def admit(self, count):
+        """
+        Raises Overloaded if count more requests would take the unanswered ones past maxPending.
+        """
+        if self.pending + count > self.maxPending:
+            self.rejected += count
+            raise Overloaded(str(self.pending) + " requests pending, " + str(count) + " more would exceed " + str(self.maxPending))
+
+    def enqueue(self, endpoint, inputs, settings):
+        """
+        Adds one parsed request to the batch gathering for its endpoint and settings, and returns the
+        future of its result.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (endpoint, settings)
+        group = self.groups.setdefault(key, [])
+        group.append((inputs, future, time.perf_counter()))
+        self.pending += 1
+        if len(group) >= self.maxBatch:
+            self.flush(key)
+        elif len(group) == 1:
+            loop.call_later(self.window, self.flush, key, group)
+        return future
+
+    def flush(self, key, group=None):
+        """
+        Sends the requests gathered under key off as one batch. With group, only if that is still the
+        gathering list (the timer of a batch that already filled up does nothing).
+        """
+        if group is not None and self.groups.get(key) is not group:
+            return
+        task = asyncio.get_running_loop().create_task(self.run(key, self.groups.pop(key)))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, key, group):
+        endpoint, settings = key
+        fields, defaults, function = ENDPOINTS[endpoint]
+        columns = {name: np.array([inputs[i] for inputs, _, _ in group]) for i, name in enumerate(fields)}
+        try:
+            async with self.slots:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, function, columns, dict(zip(defaults, settings)), self.backend)
+        except Exception as error:
+            for _, future, _ in group:
+                if not future.done():
+                    future.set_exception(error)
+        else:
+            for i, (_, future, _) in enumerate(group):
+                if not future.done():   #The client may have gone away
+                    future.set_result({name: values[i] for name, values in result.items()})
+        finally:
+            self.pending -= len(group)
+
+        latency = 1000 * (time.perf_counter() - np.array([arrival for _, _, arrival in group]))
+        self.requests[endpoint] += len(group)
+        self.batches[endpoint] += 1
+        self.latencySum[endpoint] += float(latency.sum())
+        self.latency[endpoint].update(latency)
+
+    def stats(self):
+        """
+        Returns the pending and rejected request counts and, per endpoint, the requests, batches, mean
+        batch size and latency in ms (mean, quantiles, and the histogram as low, width and counts).
+        """
+        endpoints = {}
+        for name in ENDPOINTS:
+            histogram = self.latency[name]
+            count = self.requests[name]
+            endpoints[name] = {
+                'requests': count,
+                'batches': self.batches[name],
+                'meanBatch': count / self.batches[name] if self.batches[name] else 0.0,
+                'latencyMs': {
+                    'mean': self.latencySum[name] / count if count else None,
+                    'max': histogram.max if count else None,
+                    **{'p' + str(round(100 * q)): float(histogram.quantile(q)) if count else None for q in (0.5, 0.9, 0.99)},
+                    'histogram': {'low': histogram.low, 'width': histogram.width, 'counts': histogram.counts.tolist()},
+                },
+            }
+        return {'pending': self.pending, 'rejected': self.rejected, 'endpoints': endpoints}
+
+    async def route(self, method, target, body):
+        """
+        Answers one HTTP request; returns (status, JSON-serializable response).
+        """
+        path = target.split('?')[0].strip('/')
+        if path == 'stats':
+            return (200, self.stats()) if method == 'GET' else (405, {'error': "use GET"})
+        if path not in ENDPOINTS:
+            return 404, {'error': "unknown endpoint /" + path + " (expected /" + ", /".join(ENDPOINTS) + " or /stats)"}
+        if method != 'POST':
+            return 405, {'error': "use POST"}
+        try:
+            payload = json.loads(body or b'{}')
+            if isinstance(payload, list):
+                return 200, await self.submitMany(path, payload)
+            return 200, await self.submit(path, payload)
+        except Overloaded as error:
+            return 503, {'error': "overloaded: " + str(error)}
+        except (ValueError, TypeError) as error:
+            return 400, {'error': str(error)}
+        except Exception as error:
+            return 500, {'error': repr(error)}
+
+    async def connection(self, reader, writer):
+        """
+        Serves the HTTP/1.1 requests of one connection, one after another, until the client closes it.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, version = line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    status, response = 413, {'error': "request body larger than " + str(MAX_BODY) + " bytes"}
+                else:
+                    status, response = await self.route(method, target, await reader.readexactly(length))
+                try:
+                    data = json.dumps(response, allow_nan=False).encode()     #Strict JSON: NaN and Infinity are not valid tokens
+                except ValueError:
+                    status, data = 500, json.dumps({'error': "result is not finite"}).encode()
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % (status, REASONS[status].encode(), len(data)) + data)
+                await writer.drain()
+                if length > MAX_BODY or version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass    #Malformed request or client gone: drop the connection
+        except asyncio.CancelledError:
+            pass    #Server closing while the connection waits for its next request
+        finally:
+            writer.close()
+
+    async def listen(self, host='127.0.0.1', port=8080, path=None):
+        """
+        Starts accepting connections, on the Unix socket path if given and otherwise on TCP host:port
+        (port 0 picks a free one), and returns the asyncio Server.
+        """
+        self.start()
+        if path is not None:
+            return await asyncio.start_unix_server(self.connection, path)
+        return await asyncio.start_server(self.connection, host, port)
+
+    async def serve(self, host='127.0.0.1', port=8080, path=None):
+        """
+        Runs the server until cancelled.
+        """
+        server = await self.listen(host, port, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+async def post(host, port, endpoint, payloads):
+    """
+    Minimal client: sends payloads one after another over one keep-alive connection to the server at
+    host:port and returns the decoded responses as (status, response) pairs.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    responses = []
+    try:
+        for payload in payloads:
+            body = json.dumps(payload).encode()
+            writer.write(b'POST /%s HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n' % (endpoint.encode(), host.encode(), len(body)) + body)
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b''):
+                    break
+                name, _, value = header.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            responses.append((status, json.loads(await reader.readexactly(length))))
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return responses
+
+
+def main(host='127.0.0.1', port=8080, path=None):
+    """
+    Serves queries until interrupted, e.g.
+        curl -d '{"v0": 30, "theta": 0.7}' http://127.0.0.1:8080/simulate
+
+    Units: kg, m, sec, rad
+    """
+    server = SimulationServer()
+    print("serving on " + (path if path is not None else "http://" + host + ":" + str(port)))
+    try:
+        asyncio.run(server.serve(host, port, path))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
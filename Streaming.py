@@ -0,0 +1,92 @@
+import numpy as np  #Math library
+import math     #python's math module
+from Trajectory import COLUMNS, T, X, Y, VX, VY, AX
+
+
+def decimate(samples, every):
+    """
+    Yields every every-th sample of an iterable of (t, x, y, vX, vY, aX, aY) samples, starting with
+    the first one. A few samples are kept on top of those so that summarize gives the same result as
+    for the full stream: the highest sample (yielded as soon as a lower one follows it) and the last
+    two samples, between which the landing is interpolated.
+    """
+    sent = -1       #Index of the last sample yielded
+    top = None      #Highest sample so far and its index
+    topIndex = -1
+    before = None   #The two most recent samples; every sample is yielded (or not) one sample late,
+    previous = None #once it is known whether it is one of the last two
+    for i, sample in enumerate(samples):
+        if top is not None and sample[Y] <= top[Y] and topIndex > sent:
+            yield top       #Only known to be a maximum once a lower sample follows it
+            sent = topIndex
+        if i > 0 and (i - 1) % every == 0 and i - 1 > sent:
+            yield previous
+            sent = i - 1
+        if top is None or sample[Y] > top[Y]:
+            top, topIndex = sample, i
+        before, previous = previous, sample
+    if previous is None:
+        return
+    if i - 1 > sent:
+        yield before
+    if i > sent:
+        yield previous
+
+
+def blocks(samples, blockSize=4096):
+    """
+    Groups an iterable of samples into (blockSize, 7) arrays with columns t, x, y, vX, vY, aX, aY
+    (the last block may be shorter). Every block is a new array, so a caller can keep some of them
+    while at most one block is being filled.
+    """
+    block = np.empty((blockSize, len(COLUMNS)))
+    count = 0
+    for sample in samples:
+        block[count] = sample
+        count += 1
+        if count == blockSize:
+            yield block
+            block = np.empty((blockSize, len(COLUMNS)))
+            count = 0
+    if count > 0:
+        yield block[:count]
+
+
+def summarize(samples):
+    """
+    Consumes an iterable of samples of a fixed-step solver (single samples or blocks from blocks(),
+    decimated or not) and returns range, apex, apexTime, flightTime, impactVX, impactVY, impactSpeed,
+    steps and rejected, the same values as Trajectory.summary() for the whole flight, keeping only the
+    current and previous sample, so a flight of any length is summarized in constant memory.
+    evaluations is left out, since it depends on the solver.
+
+    apex is the highest sample and the landing point is interpolated between the last two samples,
+    exactly as Trajectory does for the Euler and custom solvers; decimate always keeps those samples.
+    steps is the solver's step counter of the last sample, t / tStep, where tStep is the time between
+    the last two samples (the fixed-step solvers sample at t = counter * tStep). They never reject
+    steps, so rejected is 0.
+
+    Units: kg, m, sec, rad
+    """
+    previous = None
+    last = None
+    apex = None
+    for item in samples:
+        rows = item if isinstance(item, np.ndarray) and item.ndim == 2 else (item,)
+        for row in rows:
+            if apex is None or row[Y] > apex[Y]:
+                apex = row
+            previous, last = last, row
+    if last is None:
+        raise ValueError("no samples to summarize")
+    if previous is None:
+        previous = last
+    tStep = last[T] - previous[T]
+
+    fraction = previous[Y] / (previous[Y] - last[Y]) if last[Y] < 0 <= previous[Y] else 1.0
+    impact = [previous[i] + fraction * (last[i] - previous[i]) for i in range(AX)]
+    return {
+        'range': float(impact[X]), 'apex': float(apex[Y]), 'apexTime': float(apex[T]), 'flightTime': float(impact[T]),
+        'impactVX': float(impact[VX]), 'impactVY': float(impact[VY]), 'impactSpeed': math.hypot(impact[VX], impact[VY]),
+        'steps': round(last[T] / tStep) if tStep > 0 else 0, 'rejected': 0,
+    }
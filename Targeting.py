@@ -0,0 +1,293 @@
+import numpy as np  #Math library
+import math     #python's math module
+from scipy.optimize import brentq, minimize_scalar
+from BatchKinematics import integrateBatch
+from RungeKuttaKinematics import integrateAdaptive
+
+MAX_DOUBLINGS = 64      #Bracket doublings of minimumSpeed before giving up, whatever maxSpeed is
+
+
+def heightError(theta, v0, x, y, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, rtol=1e-8):
+    """
+    Returns how far above the target (x, y) a shot passes: the height of the trajectory where it
+    reaches x, minus y. A shot that lands before it gets to x (on ground at the height of the target
+    or of the launch point, whichever is lower) counts as passing below by its height deficit plus
+    the distance it falls short, which keeps the function continuous in theta and v0.
+
+    Uses adaptive RK45 steps that stop exactly at x = x, so each call is one short integration.
+
+    Units: kg, m, sec, rad
+    """
+    floor = min(0.0, y)
+    trajectory = integrateAdaptive(v0, theta, m, rho, A, Cd, g, rtol=rtol, atol=rtol*1e-2, stopX=x, floor=floor)
+    if trajectory.range < x:
+        return floor - y - (x - trajectory.range)
+    return trajectory.y[-1] - y
+
+
+def targetAngles(x, y, v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tolerance=1e-10, rtol=1e-8, samples=8):
+    """
+    Finds the low (flat) and high (lobbed) launch angles that hit the point (x, y) at speed v0.
+
+    Shooting method: heightError is sampled at a few angles between the line of sight to the target
+    (where every shot passes below it) and straight up (where every shot lands short), which brackets
+    both solutions around the highest sample, and each bracket is then solved with Brent's method.
+    That takes about samples + 2*10 trajectory evaluations. If no sample passes above the target, the
+    best one is refined with a bounded Brent search before giving up.
+
+    Returns (low angle, high angle) in rad, or (None, None) if the target is out of reach.
+
+    Units: kg, m, sec, rad
+    """
+    if x <= 0:
+        raise ValueError("the target must be in front of the launch point (x > 0)")
+    error = lambda theta: heightError(theta, v0, x, y, m, rho, A, Cd, g, rtol)
+
+    thetas = np.linspace(math.atan2(y, x), math.pi/2, samples + 2)
+    errors = [-math.inf] + [error(theta) for theta in thetas[1:-1]] + [-math.inf]
+    best = int(np.argmax(errors))
+    if errors[best] > 0:
+        #The last sample below the target before the highest one, and the first one after it
+        low = max(i for i in range(best) if errors[i] <= 0)
+        high = min(i for i in range(best + 1, len(thetas)) if errors[i] <= 0)
+        lowBracket = (thetas[low], thetas[low+1])
+        highBracket = (thetas[high-1], thetas[high])
+    else:
+        result = minimize_scalar(lambda theta: -error(theta), bounds=(thetas[best-1], thetas[best+1]), method='bounded', options={'xatol': tolerance**0.5})
+        if result.fun >= 0:
+            return None, None
+        lowBracket = (thetas[best-1], result.x)
+        highBracket = (result.x, thetas[best+1])
+    return brentq(error, *lowBracket, xtol=tolerance), brentq(error, *highBracket, xtol=tolerance)
+
+
+def minimumSpeed(x, y, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tolerance=1e-10, rtol=1e-8, maxSpeed=1000.0):
+    """
+    Finds the launch speed that hits the point (x, y) at launch angle theta; any slower shot passes
+    below the target.
+
+    The drag-free speed is a lower bound, since drag only makes the shot fall short. The bracket is
+    grown from there by doubling, and then solved with Brent's method.
+
+    Returns the speed in m/s, or None if the angle does not point above the target, no speed up to
+    maxSpeed (or MAX_DOUBLINGS doublings of the drag-free speed) reaches it, or the shot cannot be
+    integrated (a non-finite height error).
+
+    Units: kg, m, sec, rad
+    """
+    if x <= 0:
+        raise ValueError("the target must be in front of the launch point (x > 0)")
+    rise = x * math.tan(theta) - y
+    if rise <= 0 or theta >= math.pi/2:
+        return None
+    error = lambda v0: heightError(theta, v0, x, y, m, rho, A, Cd, g, rtol)
+
+    low = x / math.cos(theta) * math.sqrt(g / (2 * rise))     #Drag-free speed
+    high = 2 * low
+    for _ in range(MAX_DOUBLINGS):
+        fHigh = error(high)
+        if not math.isfinite(fHigh):
+            return None
+        if fHigh > 0:
+            return brentq(error, low, high, xtol=tolerance)
+        low, high = high, 2 * high
+        if low > maxSpeed:
+            return None
+    return None
+
+
+def heightErrorBatch(theta, v0, x, y, m, rho, A, Cd, g, tStep, backend='python'):
+    """
+    Array version of heightError on BatchKinematics.integrateBatch (Euler steps of size tStep, with
+    the height at x interpolated between the two samples around it).
+    """
+    floor = np.minimum(0.0, y)
+    result = integrateBatch(theta, v0, m, rho, A, Cd, g, tStep, backend=backend, stopX=x, floor=floor)
+    return np.where(result['landed'], floor - y - (x - result['range']), result['height'] - y)
+
+
+def illinois(evaluate, low, high, fLow, fHigh, tolerance, maxIterations=100):
+    """
+    Solves many brackets [low, high] (arrays, with fLow and fHigh of opposite signs) at once with the
+    Illinois (modified regula falsi) method in lockstep. evaluate(s, index) returns the function at
+    points s for the lanes in index, so lanes stop costing anything once their bracket is narrower
+    than tolerance.
+    """
+    low, high, fLow, fHigh = low.copy(), high.copy(), fLow.copy(), fHigh.copy()
+    root = (low + high) / 2
+    side = np.zeros(low.shape, dtype=int)
+    active = np.flatnonzero(np.isfinite(low) & np.isfinite(high))
+    for _ in range(maxIterations):
+        if active.size == 0:
+            break
+        s = (low[active]*fHigh[active] - high[active]*fLow[active]) / (fHigh[active] - fLow[active])
+        f = evaluate(s, active)
+        root[active] = s
+        sameAsLow = np.sign(f) == np.sign(fLow[active])
+
+        i = active[sameAsLow]
+        low[i], fLow[i] = s[sameAsLow], f[sameAsLow]
+        fHigh[i] = np.where(side[i] == -1, 0.5 * fHigh[i], fHigh[i])
+        side[i] = -1
+        i = active[~sameAsLow]
+        high[i], fHigh[i] = s[~sameAsLow], f[~sameAsLow]
+        fLow[i] = np.where(side[i] == 1, 0.5 * fLow[i], fLow[i])
+        side[i] = 1
+
+        active = active[(np.abs(high[active] - low[active]) >= tolerance) & (f != 0)]
+    return root
+
+
+def targetAnglesBatch(x, y, v0=30, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tolerance=1e-6, tStep=0.01, samples=8, backend='python'):
+    """
+    Finds the low and high launch angles for many targets at once, with the same shooting method as
+    targetAngles running in lockstep on every lane of BatchKinematics.integrateBatch.
+
+    Every argument may be a scalar or an array; they are broadcast against each other. The angles
+    are sampled with one batch call of samples + 2 shots per target, then both brackets of every
+    target are solved together with the Illinois method in a few more batch calls. The accuracy is
+    that of Euler steps of size tStep (about 1 degree near the edge of the reachable region at
+    tStep=0.01), so there is no point in a tolerance much below that. backend is passed on to
+    integrateBatch.
+
+    Returns (low angles, high angles) in rad as arrays of the broadcast shape, NaN where the target
+    is out of reach.
+
+    Units: kg, m, sec, rad
+    """
+    shape = np.broadcast_shapes(*[np.shape(arg) for arg in (x, y, v0, m, rho, A, Cd, g)])
+    x, y, v0, m, rho, A, Cd, g = [a.ravel() for a in np.broadcast_arrays(*[np.asarray(arg, dtype=float) for arg in (x, y, v0, m, rho, A, Cd, g)])]
+    if np.any(x <= 0):
+        raise ValueError("the targets must be in front of the launch point (x > 0)")
+    n = x.size
+    lanes = np.arange(n)
+
+    def evaluate(theta, index):
+        return heightErrorBatch(theta, v0[index], x[index], y[index], m[index], rho[index], A[index], Cd[index], g[index], tStep, backend)
+
+    #Sample every target at angles from the line of sight (always below the target) to straight up (always short)
+    lineOfSight = np.arctan2(y, x)
+    thetas = lineOfSight[:, None] + (math.pi/2 - lineOfSight)[:, None] * np.linspace(0.0, 1.0, samples + 2)
+    errors = evaluate(thetas, lanes[:, None])
+    best = np.argmax(errors[:, 1:-1], axis=1) + 1
+    top = thetas[lanes, best]
+    topError = errors[lanes, best]
+
+    #Targets whose samples all pass below: refine the highest one with a golden-section search
+    refined = topError <= 0
+    unresolved = np.flatnonzero(refined)
+    if unresolved.size > 0:
+        ratio = (math.sqrt(5) - 1) / 2
+        low = thetas[unresolved, best[unresolved] - 1]
+        high = thetas[unresolved, best[unresolved] + 1]
+        left = high - ratio*(high - low)
+        right = low + ratio*(high - low)
+        leftError = evaluate(left, unresolved)
+        rightError = evaluate(right, unresolved)
+        steps = min(max(math.ceil(math.log(math.sqrt(tolerance) / np.max(high - low)) / math.log(ratio)), 0), 100)     #Capped, as the bracket stops shrinking at the float spacing
+        for _ in range(steps):
+            moveRight = leftError < rightError      #The highest point is right of the left candidate
+            low = np.where(moveRight, left, low)
+            high = np.where(moveRight, high, right)
+            left, right = np.where(moveRight, right, high - ratio*(high - low)), np.where(moveRight, low + ratio*(high - low), left)
+            newError = evaluate(np.where(moveRight, right, left), unresolved)
+            leftError, rightError = np.where(moveRight, rightError, newError), np.where(moveRight, newError, leftError)
+        top[unresolved] = (low + high) / 2
+        topError[unresolved] = evaluate(top[unresolved], unresolved)
+
+    #Brackets: the last sample below the target before the highest one and the first one after it,
+    #narrowed down to the highest point where it was refined (all samples are below there)
+    column = np.arange(samples + 2)
+    below = errors <= 0
+    lowIndex = np.where(below & (column < best[:, None]), column, -1).max(axis=1)
+    highIndex = np.where(below & (column > best[:, None]), column, samples + 2).min(axis=1)
+    start = np.concatenate([thetas[lanes, lowIndex], np.where(refined, top, thetas[lanes, highIndex - 1])])
+    stop = np.concatenate([np.where(refined, top, thetas[lanes, lowIndex + 1]), thetas[lanes, highIndex]])
+    fStart = np.concatenate([errors[lanes, lowIndex], np.where(refined, topError, errors[lanes, highIndex - 1])])
+    fStop = np.concatenate([np.where(refined, topError, errors[lanes, lowIndex + 1]), errors[lanes, highIndex]])
+
+    #Solve both brackets of every reachable target together
+    reachable = np.concatenate([topError > 0, topError > 0])
+    index = np.concatenate([lanes, lanes])
+    start[~reachable] = np.nan
+    roots = illinois(lambda s, active: evaluate(s, index[active]), start, stop, fStart, fStop, tolerance)
+    roots[~reachable] = np.nan
+    return roots[:n].reshape(shape), roots[n:].reshape(shape)
+
+
+def minimumSpeedBatch(x, y, theta, m=1, rho=1.225, A=0.05, Cd=0.5, g=9.8, tolerance=1e-6, tStep=0.01, maxSpeed=1000.0, backend='python'):
+    """
+    Array version of minimumSpeed: finds the launch speeds that hit many targets (x, y) at launch
+    angles theta, growing every bracket by doubling in lockstep and then solving them together with
+    the Illinois method on BatchKinematics.integrateBatch.
+
+    Every argument may be a scalar or an array; they are broadcast against each other. Returns the
+    speeds in m/s as an array of the broadcast shape, NaN where minimumSpeed would return None.
+
+    Units: kg, m, sec, rad
+    """
+    shape = np.broadcast_shapes(*[np.shape(arg) for arg in (x, y, theta, m, rho, A, Cd, g)])
+    x, y, theta, m, rho, A, Cd, g = [a.ravel() for a in np.broadcast_arrays(*[np.asarray(arg, dtype=float) for arg in (x, y, theta, m, rho, A, Cd, g)])]
+    if np.any(x <= 0):
+        raise ValueError("the targets must be in front of the launch point (x > 0)")
+
+    def evaluate(v0, index):
+        return heightErrorBatch(theta[index], v0, x[index], y[index], m[index], rho[index], A[index], Cd[index], g[index], tStep, backend)
+
+    rise = x * np.tan(theta) - y
+    possible = (rise > 0) & (theta < math.pi/2)
+    low = np.full(x.shape, np.nan)
+    low[possible] = x[possible] / np.cos(theta[possible]) * np.sqrt(g[possible] / (2 * rise[possible]))     #Drag-free speed
+    high = 2 * low
+    fLow = np.full(x.shape, -np.inf)
+    fHigh = np.full(x.shape, -np.inf)
+
+    #Double the brackets of the targets that are still out of reach until all of them are hit
+    growing = np.flatnonzero(possible)
+    for _ in range(MAX_DOUBLINGS):
+        if growing.size == 0:
+            break
+        fHigh[growing] = evaluate(high[growing], growing)
+        short = fHigh[growing] <= 0
+        fLow[growing[short]] = fHigh[growing[short]]
+        low[growing[short]] = high[growing[short]]
+        high[growing[short]] *= 2
+        growing = growing[short & (low[growing] <= maxSpeed)]
+
+    fLow[~np.isfinite(fLow)] = np.nan
+    bracketed = np.isfinite(fHigh) & (fHigh > 0)
+    unknown = np.flatnonzero(bracketed & np.isnan(fLow))
+    fLow[unknown] = evaluate(low[unknown], unknown)
+    low[~bracketed] = np.nan
+    speed = illinois(lambda s, active: evaluate(s, active), low, high, fLow, fHigh, tolerance)
+    speed[~bracketed] = np.nan
+    return speed.reshape(shape)
+
+
+def main():
+    """
+    Finds both launch angles that hit a target 40 m away and 5 m up at 30 m/s, and the speed needed
+    to hit it at 30 degrees, first on single RK45 trajectories and then for a row of targets at once.
+
+    Units: kg, m, sec, rad
+    """
+    m = 1
+    v0 = 30
+    rho = 1.225     #Fluid Density
+    A = 0.05        #Cross-sectional Area
+    Cd = 0.5        #Drag coefficient, a ball is approx. 0.5
+    g = 9.8
+    x, y = 40.0, 5.0
+
+    low, high = targetAngles(x, y, v0, m, rho, A, Cd, g)
+    print("low angle: " + str(math.degrees(low)) + "  high angle: " + str(math.degrees(high)))
+    print("speed at 30 degrees: " + str(minimumSpeed(x, y, math.radians(30), m, rho, A, Cd, g)))
+
+    targets = np.linspace(10, 60, 6)
+    lows, highs = targetAnglesBatch(targets, y, v0, m, rho, A, Cd, g)
+    for i in range(len(targets)):
+        print("x: " + str(targets[i]) + "  low: " + str(math.degrees(lows[i])) + "  high: " + str(math.degrees(highs[i])))
+
+
+if __name__ == "__main__":  #Run the main function
+    main()
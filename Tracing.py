@@ -0,0 +1,97 @@
+import numpy as np  #Math library
+from Trajectory import COLUMNS
+
+
+class StepTracer:
+    """
+    Opt-in hook that collects one record per integration step and hands them to a sink in batches.
+
+    The solvers call record() once per step when a tracer is passed to them and do nothing otherwise,
+    so tracing costs nothing unless it is turned on. Records are copied into a preallocated
+    (batchSize, 7) buffer with columns t, x, y, vX, vY, aX, aY, and the sink is called with the
+    filled part of the buffer every batchSize steps and once more by close().
+
+    A sink is any callable taking a 2D array (CsvSink, BinarySink and PrintSink are provided), or a
+    list, which then receives a copy of every batch.
+    """
+
+    def __init__(self, sink, batchSize=4096):
+        self.sink = sink
+        self.buffer = np.empty((batchSize, len(COLUMNS)))
+        self.count = 0
+        self.steps = 0
+
+    def record(self, row):
+        self.buffer[self.count] = row
+        self.count += 1
+        self.steps += 1
+        if self.count == self.buffer.shape[0]:
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        if isinstance(self.sink, list):
+            self.sink.append(self.buffer[:self.count].copy())
+        else:
+            self.sink(self.buffer[:self.count])
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        if hasattr(self.sink, 'close'):
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink:
+    """
+    Appends step records to a CSV file with a t,x,y,vX,vY,aX,aY header.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.file.write(','.join(COLUMNS) + '\n')
+
+    def __call__(self, rows):
+        np.savetxt(self.file, rows, delimiter=',', fmt='%.17g')
+
+    def close(self):
+        self.file.close()
+
+
+class BinarySink:
+    """
+    Appends step records to a raw float64 file; read it back with np.fromfile(path).reshape(-1, 7).
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+
+    def __call__(self, rows):
+        rows.tofile(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+class PrintSink:
+    """
+    Prints step records the way the scripts used to print every step.
+    """
+
+    def __call__(self, rows):
+        for t, x, y, vX, vY, aX, aY in rows.tolist():
+            print("t:  " + str(t))
+            print("x:  " + str(x))
+            print("y:  " + str(y))
+            print("Vx: " + str(vX))
+            print("Vy: " + str(vY))
+            print("Ax: " + str(aX))
+            print("Ay: " + str(aY))
+            print("")
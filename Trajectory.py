@@ -0,0 +1,221 @@
+import numpy as np  #Math library
+import math     #python's math module
+from dataclasses import dataclass
+
+COLUMNS = ('t', 'x', 'y', 'vX', 'vY', 'aX', 'aY')   #Columns of Trajectory.data
+T, X, Y, VX, VY, AX, AY = range(len(COLUMNS))
+
+
+@dataclass
+class LaunchParams:
+    """
+    Initial values and constants of one shot, with the same defaults as EulerKinematics.
+
+    Units: kg, m, sec, rad
+    """
+    m: float = 1
+    v0: float = 30
+    theta: float = math.radians(45)
+    rho: float = 1.225  #Fluid Density
+    A: float = 0.05     #Cross-sectional Area
+    Cd: float = 0.5     #Drag coefficient, a ball is approx. 0.5
+    g: float = 9.8
+    tStep: float = 0.005    #Step size of the fixed-step solvers
+
+
+def allocate(v0, theta, g, tStep, maxSteps):
+    """
+    Returns an empty (rows, 7) array sized for a whole flight: the drag-free flight time divided by
+    tStep plus some margin, which is always enough because drag only shortens the flight.
+    """
+    flightTime = 2 * v0 * max(math.sin(theta), 0.0) / g
+    return np.empty((min(int(flightTime / tStep * 1.05) + 16, maxSteps + 1), len(COLUMNS)))
+
+
+def grow(data):
+    """
+    Returns a copy of data with twice as many rows, for the rare trajectory that outgrows its estimate.
+    """
+    bigger = np.empty((2 * data.shape[0],) + data.shape[1:])
+    bigger[:data.shape[0]] = data
+    return bigger
+
+
+class Trajectory:
+    """
+    Result of one simulation: every sample in one contiguous (n, 7) array with columns t, x, y, vX,
+    vY, aX, aY, plus summary fields.
+
+    range, flightTime:  where and when the projectile lands (exact for the RK solvers, linearly
+                        interpolated between the last two samples for the Euler and custom solvers)
+    apex, apexTime:     greatest height reached and when
+    impactVelocity:     (vX, vY) at landing
+    steps, rejected, evaluations:  accepted steps, rejected steps and derivative evaluations
+
+    Units: kg, m, sec, rad
+    """
+
+    def __init__(self, data, steps, evaluations, rejected=0, apex=None, impact=None, dense=None):
+        """
+        data:    filled rows of the sample array (a view is kept, not a copy)
+        apex:    exact (t, x, y, vX, vY) of the apex if the solver found it, otherwise the highest sample is used
+        impact:  exact (t, x, y, vX, vY) of the ground impact if the solver found it, otherwise it is interpolated
+        dense:   (coefficients, h) of a solver's continuous extension: the state a fraction s into
+                 step i is data[i] + h[i] * sum(coefficients[i, p] * s**(p+1)) for p = 0..3, where h[i]
+                 is the full size of the step (before it was cut short at an event)
+        """
+        self.data = data
+        self.steps = steps
+        self.evaluations = evaluations
+        self.rejected = rejected
+        self.dense = dense
+
+        if apex is None:
+            top = int(np.argmax(data[:, Y]))
+            apex = data[top, :AX]
+        self.apexTime = float(apex[T])
+        self.apex = float(apex[Y])
+
+        if impact is None:
+            last = data[-1]
+            previous = data[-2] if len(data) > 1 else last
+            fraction = previous[Y] / (previous[Y] - last[Y]) if last[Y] < 0 <= previous[Y] else 1.0
+            impact = previous[:AX] + fraction * (last[:AX] - previous[:AX])
+        self.flightTime = float(impact[T])
+        self.range = float(impact[X])
+        self.impactVelocity = (float(impact[VX]), float(impact[VY]))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def impactSpeed(self):
+        return math.hypot(*self.impactVelocity)
+
+    @property
+    def t(self):
+        return self.data[:, T]
+
+    @property
+    def x(self):
+        return self.data[:, X]
+
+    @property
+    def y(self):
+        return self.data[:, Y]
+
+    @property
+    def vX(self):
+        return self.data[:, VX]
+
+    @property
+    def vY(self):
+        return self.data[:, VY]
+
+    @property
+    def aX(self):
+        return self.data[:, AX]
+
+    @property
+    def aY(self):
+        return self.data[:, AY]
+
+    def interval(self, column, values):
+        """
+        Returns the index of the sample interval every value of a sorted column falls in, and a mask
+        of the values inside the trajectory.
+        """
+        values = np.asarray(values, dtype=float)
+        samples = self.data[:, column]
+        inside = (values >= samples[0]) & (values <= samples[-1])
+        index = np.clip(np.searchsorted(samples, values, side='right') - 1, 0, max(len(samples) - 2, 0))
+        return index, inside
+
+    def interpolate(self, index, s):
+        """
+        Evaluates the interpolant of sample interval index at fractions s (0 to 1) of it, and returns
+        (..., 5) rows of t, x, y, vX, vY.
+
+        For the RK45 solver this is the Dormand-Prince continuous extension of the step, which is as
+        accurate as the step itself. Otherwise it is the cubic Hermite interpolant, with the velocities
+        as derivatives of the positions and the accelerations as derivatives of the velocities, so it
+        matches every sample and its slope.
+        """
+        start = self.data[index]
+        end = self.data[np.minimum(index + 1, len(self.data) - 1)]
+        h = (end[..., T] - start[..., T])[..., None]
+        s = s[..., None]
+        t = start[..., T:X] + h*s
+
+        if self.dense is not None:
+            coefficients, fullStep = self.dense
+            step = np.minimum(index, len(fullStep) - 1)
+            hFull = fullStep[step][..., None]
+            sFull = np.divide(h*s, hFull, out=np.zeros(t.shape), where=hFull > 0)
+            polynomial = coefficients[step, 3]
+            for p in (2, 1, 0):     #Horner's rule
+                polynomial = polynomial*sFull + coefficients[step, p]
+            return np.concatenate([t, start[..., X:AX] + hFull*sFull*polynomial], axis=-1)
+
+        h00 = (1 + 2*s) * (1 - s)**2
+        h10 = s * (1 - s)**2
+        h01 = s*s * (3 - 2*s)
+        h11 = s*s * (s - 1)
+        state = h00*start[..., X:AX] + h*h10*start[..., VX:] + h01*end[..., X:AX] + h*h11*end[..., VX:]
+        return np.concatenate([t, state], axis=-1)
+
+    def stateAt(self, t):
+        """
+        Returns the interpolated state at the times t (scalar or array of any shape) as an array of
+        shape t.shape + (5,) with columns t, x, y, vX, vY (index it with T, X, Y, VX, VY). Times
+        outside the flight give NaN.
+
+        Uses the interpolant (see interpolate) between the two samples around each time, found by binary
+        search, so there is no need to re-simulate or use a finer tStep.
+
+        Units: kg, m, sec, rad
+        """
+        t = np.asarray(t, dtype=float)
+        index, inside = self.interval(T, t)
+        start = self.data[index, T]
+        h = self.data[np.minimum(index + 1, len(self.data) - 1), T] - start
+        s = np.divide(t - start, h, out=np.zeros(t.shape), where=h > 0)
+        state = self.interpolate(index, s)
+        state[~inside] = np.nan
+        return state
+
+    def stateAtX(self, x, iterations=5):
+        """
+        Returns the interpolated state where the projectile is at the horizontal positions x (scalar
+        or array), e.g. the height at a wall, with the same columns as stateAt. Positions the flight
+        does not reach give NaN.
+
+        The samples around each x are found by binary search (x only grows during a flight), and the
+        time within the interval by Newton's method on the interpolant, whose slope is h*vX.
+
+        Units: kg, m, sec, rad
+        """
+        x = np.asarray(x, dtype=float)
+        index, inside = self.interval(X, x)
+        start = self.data[index]
+        end = self.data[np.minimum(index + 1, len(self.data) - 1)]
+        h = end[..., T] - start[..., T]
+        width = end[..., X] - start[..., X]
+        s = np.clip(np.divide(x - start[..., X], width, out=np.zeros(x.shape), where=width > 0), 0.0, 1.0)     #Linear first guess
+        for _ in range(iterations):
+            state = self.interpolate(index, s)
+            slope = h * state[..., VX]
+            s = np.clip(s - np.divide(state[..., X] - x, slope, out=np.zeros(x.shape), where=slope > 0), 0.0, 1.0)
+        state = self.interpolate(index, s)
+        state[~inside] = np.nan
+        return state
+
+    def summary(self):
+        """
+        Returns the summary fields as a dict.
+        """
+        return {
+            'range': self.range, 'apex': self.apex, 'apexTime': self.apexTime, 'flightTime': self.flightTime,
+            'impactVX': self.impactVelocity[0], 'impactVY': self.impactVelocity[1], 'impactSpeed': self.impactSpeed,
+            'steps': self.steps, 'rejected': self.rejected, 'evaluations': self.evaluations,
+        }